@@ -68,6 +68,44 @@ class CryptoCoin:
 		self.ticker = ticker
 		self.price = float(ticker.get(u'price'))
 	
+	def SetOrderBookDepth(self, order_book, depth=10):
+		""" Sets the best levels of a live gdax.OrderBook and computes the 
+		depth imbalance and size weighted prices from them
+		"""
+		# Get the best levels of the book as NumPy arrays
+		book = order_book.get_depth_arrays(depth)
+		
+		# Total resting size on each side of the book
+		bid_volume = np.sum(book.bid_sizes)
+		ask_volume = np.sum(book.ask_sizes)
+		
+		# Imbalance is +1 when only bids rest in the window, -1 when only asks,
+		# and None, like the vwap of an empty side, when nothing rests there
+		self.book_imbalance = None
+		if bid_volume + ask_volume:
+			self.book_imbalance = (bid_volume - ask_volume)/(bid_volume + ask_volume)
+		
+		# Size weighted average price of each side of the book
+		self.book_bid_vwap = None
+		if bid_volume:
+			self.book_bid_vwap = np.dot(book.bid_prices, book.bid_sizes)/bid_volume
+		self.book_ask_vwap = None
+		if ask_volume:
+			self.book_ask_vwap = np.dot(book.ask_prices, book.ask_sizes)/ask_volume
+		
+		# Keep a copy of the levels since the book reuses its buffers
+		self.book_bid_prices = np.copy(book.bid_prices)
+		self.book_bid_sizes = np.copy(book.bid_sizes)
+		self.book_ask_prices = np.copy(book.ask_prices)
+		self.book_ask_sizes = np.copy(book.ask_sizes)
+	
+	def SetBookFeatures(self, book_features):
+		""" Sets the latest microstructure features of a gdax.BookFeatures 
+		tracker attached to a live gdax.OrderBook
+		"""
+		# The tracker replaces its values as a whole, so they are consistent
+		self.book_features = book_features.current
+	
 	def SetCandleData(self, candles):
 		""" Sets new candle data to the object
 		"""
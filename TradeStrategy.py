@@ -70,6 +70,11 @@ class TradeStrategy:
 			print('\n Volume Weighted Variance Anomaly Trigger Strategy:')
 			strategy_results = self.VolumeWeightedVarianceAnomalyTrigger(coin)
 			
+		elif (self.strategy == 4):
+			# Order Book Imbalance strategy
+			print('\n Order Book Imbalance Strategy:')
+			strategy_results = self.OrderBookImbalance(coin)
+			
 		else:
 			print(TextColors.Red + '\n Invalid Strategy!' + TextColors.RESET)
 			strategy_results = {'buy_signal': False, 'sell_signal': False, 'buy_price': 0, 'sell_price': 0, 'buy_size': 0, 'sell_size': 0}
@@ -254,3 +259,39 @@ class TradeStrategy:
 		
 		# return the boolean signaling if you should buy or sell the crypto		
 		return {'buy_signal': buy_sig, 'sell_signal': sell_sig, 'buy_price': buy_price, 'sell_price': sell_price, 'buy_size': buy_size, 'sell_size': sell_size}
+		
+		
+	def OrderBookImbalance(self, coin):
+		# Depth and trade flow imbalance needed before a signal is taken
+		threshold = 0.3
+		
+		buy_sig = False
+		sell_sig = False
+		buy_price = 0
+		sell_price = 0
+		buy_size = 0
+		sell_size = 0
+		
+		# Features tracked by the live order book, see CryptoCoin.SetBookFeatures,
+		# which is not called unless the coin follows a gdax.BookFeatures tracker
+		features = getattr(coin, 'book_features', None)
+		if features is None or features.imbalance is None or features.trade_flow_imbalance is None or features.microprice is None:
+			return {'buy_signal': buy_sig, 'sell_signal': sell_sig, 'buy_price': buy_price, 'sell_price': sell_price, 'buy_size': buy_size, 'sell_size': sell_size}
+		
+		# Buy when resting bids outweigh the asks and buyers are lifting the offer
+		if (features.imbalance > threshold and features.trade_flow_imbalance > threshold):
+			buy_sig = True
+		
+		# Sell when resting asks outweigh the bids and sellers are hitting the bid
+		if (features.imbalance < -threshold and features.trade_flow_imbalance < -threshold):
+			sell_sig = True
+		
+		# Join the best bid and ask rather than crossing the spread
+		buy_price = features.bid
+		sell_price = features.ask
+		
+		buy_size = NOMINAL_USD_PER_TRADE/buy_price
+		sell_size = NOMINAL_USD_PER_TRADE/sell_price
+		
+		# return the boolean signaling if you should buy or sell the crypto
+		return {'buy_signal': buy_sig, 'sell_signal': sell_sig, 'buy_price': buy_price, 'sell_price': sell_price, 'buy_size': buy_size, 'sell_size': sell_size}
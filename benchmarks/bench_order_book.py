@@ -0,0 +1,158 @@
+#
+# benchmarks/bench_order_book.py
+#
+# Micro-benchmarks of the gdax OrderBook hot path on synthetic level-3 streams
+#
+# Usage: python -m benchmarks.bench_order_book [--messages N] [--levels N] [--orders-per-level N] [--seed N]
+
+from __future__ import print_function
+import argparse
+import gc
+import json
+import tracemalloc
+from timeit import default_timer
+
+from gdax.order_book import OrderBook
+from gdax.order_book_stream import iter_order_book
+from gdax.stats import LatencyHistogram
+from benchmarks.synthetic_feed import SyntheticFeed
+
+
+FORMATS = (
+    ('decimal', {}),
+    ('fixed_point', {'fixed_point': True, 'quote_increment': '0.01'}),
+    ('fixed_point, compact_ids', {'fixed_point': True, 'quote_increment': '0.01', 'compact_ids': True}),
+)
+
+
+def new_book(book_kwargs):
+    return OrderBook(product_id='BTC-USD', **book_kwargs)
+
+
+def bench_snapshot(snapshot, book_kwargs):
+    """Returns (seconds to load `snapshot`, bytes retained per resting order, peak bytes while loading).
+
+    The snapshot is decoded from JSON while memory is traced, as it would be from the REST response, so that
+    whatever the book keeps of it (such as the order id strings) is counted.
+
+    """
+    body = json.dumps(snapshot)
+    gc.collect()
+    book = new_book(book_kwargs)
+    tracemalloc.start()
+    t = default_timer()
+    res = json.loads(body)
+    book.load_snapshot(res)
+    elapsed = default_timer() - t
+    del res
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, retained / float(len(book._orders)), peak
+
+
+def bench_snapshot_stream(snapshot, book_kwargs, chunk_size=65536):
+    """Returns (seconds to load `snapshot`, peak bytes while loading) when it is parsed incrementally from chunks
+    of its JSON body, as `reset_book` does with the REST response."""
+    body = json.dumps(snapshot).encode('utf-8')
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    gc.collect()
+    book = new_book(book_kwargs)
+    tracemalloc.start()
+    t = default_timer()
+    book.load_snapshot_stream(iter_order_book(chunks))
+    elapsed = default_timer() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_stream(snapshot, messages, book_kwargs):
+    """Returns (messages per second, {message type: LatencyHistogram}) for applying `messages`."""
+    book = new_book(book_kwargs)
+    book.load_snapshot(snapshot)
+    latencies = {}
+    on_message = book.on_message
+    started = default_timer()
+    for message in messages:
+        t = default_timer()
+        on_message(message)
+        elapsed = default_timer() - t
+        histogram = latencies.get(message['type'])
+        if histogram is None:
+            histogram = latencies[message['type']] = LatencyHistogram()
+        histogram.record(elapsed)
+    total = default_timer() - started
+    return len(messages) / total, latencies, book
+
+
+def bench_queries(book, repeat=10000):
+    """Returns {query: LatencyHistogram} for the top-of-book getters."""
+    bid = book.get_bid()
+    queries = (
+        ('get_bid', book.get_bid),
+        ('get_ask', book.get_ask),
+        ('get_level', lambda: book.get_level(bid)),
+        ('get_depth(1)', lambda: book.get_depth('buy', 1)),
+        ('get_depth(10)', lambda: book.get_depth('buy', 10)),
+        ('get_snapshot(10)', lambda: book.get_snapshot(10)),
+    )
+    results = []
+    for name, query in queries:
+        histogram = LatencyHistogram()
+        for _ in range(repeat):
+            t = default_timer()
+            query()
+            histogram.record(default_timer() - t)
+        results.append((name, histogram))
+    return results
+
+
+def format_histogram(name, histogram):
+    return '  {:<18} n={:<8} mean={:7.2f}us p50={:7.2f}us p99={:7.2f}us max={:8.2f}us'.format(
+        name, histogram.count, histogram.mean * 1e6, histogram.percentile(50) * 1e6,
+        histogram.percentile(99) * 1e6, histogram.max * 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the gdax OrderBook on a synthetic full channel stream.')
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--levels', type=int, default=200)
+    parser.add_argument('--orders-per-level', type=int, default=50)
+    # relative frequencies of new orders, cancels, trades and size changes in the stream
+    parser.add_argument('--open-rate', type=float, default=0.45)
+    parser.add_argument('--cancel-rate', type=float, default=0.4)
+    parser.add_argument('--match-rate', type=float, default=0.1)
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    parser.add_argument('--volatility', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    feed = SyntheticFeed(levels=args.levels, orders_per_level=args.orders_per_level, open_rate=args.open_rate,
+                         cancel_rate=args.cancel_rate, match_rate=args.match_rate, change_rate=args.change_rate,
+                         volatility=args.volatility, seed=args.seed)
+    snapshot = feed.snapshot()
+    messages = list(feed.messages(args.messages))
+    print('snapshot: {} orders, stream: {} messages'.format(
+        len(snapshot['bids']) + len(snapshot['asks']), len(messages)))
+
+    for name, book_kwargs in FORMATS:
+        print('\n== {} =='.format(name))
+        load_time, bytes_per_order, peak = bench_snapshot(snapshot, book_kwargs)
+        print('snapshot load: {:.3f}s, {:.0f} bytes per resting order, peak {:.1f} MB'.format(
+            load_time, bytes_per_order, peak / 1e6))
+        load_time, peak = bench_snapshot_stream(snapshot, book_kwargs)
+        print('streamed snapshot load: {:.3f}s, peak {:.1f} MB'.format(load_time, peak / 1e6))
+
+        rate, latencies, book = bench_stream(snapshot, messages, book_kwargs)
+        print('stream: {:.0f} msg/s'.format(rate))
+        for message_type in sorted(latencies):
+            print(format_histogram(message_type, latencies[message_type]))
+
+        print('queries:')
+        for query, histogram in bench_queries(book):
+            print(format_histogram(query, histogram))
+
+
+if __name__ == '__main__':
+    main()
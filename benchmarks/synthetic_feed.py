@@ -0,0 +1,196 @@
+#
+# benchmarks/synthetic_feed.py
+#
+# Synthetic level-3 gdax full channel streams for benchmarking and testing the OrderBook
+
+import random
+import uuid
+from collections import OrderedDict
+
+
+class SyntheticFeed(object):
+    """Generates a self-consistent level-3 snapshot and full channel stream.
+
+    The generator keeps its own model of the resting orders, so every
+    `done`, `match` and `change` it emits refers to an order that is
+    really on the book, and matches always hit the front of the best level,
+    as on the exchange. The mid price follows a random walk and new orders
+    are placed around it without crossing the book.
+
+    Args:
+        product_id (Optional[str]): Product of the messages.
+        mid (Optional[float]): Starting mid price.
+        tick (Optional[float]): Price increment.
+        levels (Optional[int]): Price levels per side in the snapshot, and
+            the furthest distance in ticks from the mid of new orders.
+        orders_per_level (Optional[int]): Orders per level in the snapshot.
+        open_rate, cancel_rate, match_rate, change_rate (Optional[float]):
+            Relative frequencies of new orders, cancels, trades and size
+            changes in the stream.
+        volatility (Optional[float]): Standard deviation in ticks of the mid
+            price move per event.
+        seed (Optional[int]): Random seed for a reproducible stream.
+
+    """
+
+    def __init__(self, product_id='BTC-USD', mid=10000.0, tick=0.01, levels=50, orders_per_level=20,
+                 open_rate=0.45, cancel_rate=0.4, match_rate=0.1, change_rate=0.05, volatility=0.2, seed=None):
+        self.product_id = product_id
+        self.tick = tick
+        self.levels = levels
+        self.volatility = volatility
+        self.sequence = 1
+        self._random = random.Random(seed)
+        self._mid = mid / tick
+        self._trade_id = 0
+        self._events = (self._open, self._cancel, self._match, self._change)
+        self._weights = (open_rate, cancel_rate, match_rate, change_rate)
+        # (side, price in ticks) -> OrderedDict of order id -> size in units of 1e-8, in time priority
+        self._book = {}
+        self._orders = {}
+        self._ids = []
+        self._positions = {}
+        self._bids = set()
+        self._asks = set()
+
+        mid_ticks = int(self._mid)
+        for i in range(levels):
+            for _ in range(orders_per_level):
+                self._rest('buy', mid_ticks - i, self._random_size())
+                self._rest('sell', mid_ticks + 1 + i, self._random_size())
+
+    def _random_size(self):
+        return int(self._random.lognormvariate(15, 1.5)) + 1
+
+    def _price(self, ticks):
+        return '{:.8f}'.format(ticks * self.tick)
+
+    @staticmethod
+    def _size(units):
+        return '{:.8f}'.format(units / 1e8)
+
+    def _order_id(self):
+        return str(uuid.UUID(int=self._random.getrandbits(128), version=4))
+
+    def _rest(self, side, price, size):
+        order_id = self._order_id()
+        self._book.setdefault((side, price), OrderedDict())[order_id] = size
+        (self._bids if side == 'buy' else self._asks).add(price)
+        self._orders[order_id] = (side, price)
+        self._positions[order_id] = len(self._ids)
+        self._ids.append(order_id)
+        return order_id
+
+    def _unrest(self, order_id):
+        side, price = self._orders.pop(order_id)
+        level = self._book[(side, price)]
+        del level[order_id]
+        if not level:
+            del self._book[(side, price)]
+            (self._bids if side == 'buy' else self._asks).discard(price)
+        # swap-remove to pick random orders in O(1)
+        position = self._positions.pop(order_id)
+        last = self._ids.pop()
+        if last != order_id:
+            self._ids[position] = last
+            self._positions[last] = position
+
+    def _message(self, **fields):
+        fields['product_id'] = self.product_id
+        fields['sequence'] = self.sequence
+        self.sequence += 1
+        return fields
+
+    def snapshot(self):
+        """Returns the current book as a level 3 `get_product_order_book` response."""
+        bids, asks = [], []
+        for (side, price), level in self._book.items():
+            rows = bids if side == 'buy' else asks
+            for order_id, size in level.items():
+                rows.append([self._price(price), self._size(size), order_id])
+        bids.sort(key=lambda row: -float(row[0]))
+        asks.sort(key=lambda row: float(row[0]))
+        return {'sequence': self.sequence - 1, 'bids': bids, 'asks': asks}
+
+    def messages(self, count):
+        """Yields full channel messages until at least `count` have been emitted. An order entering the book yields
+        its `received` and `open`, and a trade that fills its maker a `match` and a `done`; the last event is always
+        completed so that the stream can be continued with another call."""
+        emitted = 0
+        while emitted < count:
+            self._mid += self._random.gauss(0, self.volatility)
+            for message in self._weighted_event()():
+                yield message
+                emitted += 1
+
+    def _weighted_event(self):
+        r = self._random.uniform(0, sum(self._weights))
+        for event, weight in zip(self._events, self._weights):
+            r -= weight
+            if r <= 0:
+                return event
+        return self._events[-1]
+
+    def _open(self):
+        side = self._random.choice(('buy', 'sell'))
+        distance = min(int(self._random.expovariate(0.2)), self.levels - 1)
+        if side == 'buy':
+            price = int(self._mid) - distance
+            if self._asks:
+                price = min(price, min(self._asks) - 1)
+        else:
+            price = int(self._mid) + 1 + distance
+            if self._bids:
+                price = max(price, max(self._bids) + 1)
+        size = self._random_size()
+        order_id = self._rest(side, price, size)
+        return [
+            self._message(type='received', order_id=order_id, order_type='limit', side=side,
+                          price=self._price(price), size=self._size(size)),
+            self._message(type='open', order_id=order_id, side=side, price=self._price(price),
+                          remaining_size=self._size(size)),
+        ]
+
+    def _cancel(self):
+        if not self._ids:
+            return []
+        order_id = self._random.choice(self._ids)
+        side, price = self._orders[order_id]
+        size = self._book[(side, price)][order_id]
+        self._unrest(order_id)
+        return [self._message(type='done', order_id=order_id, side=side, reason='canceled',
+                              price=self._price(price), remaining_size=self._size(size))]
+
+    def _match(self):
+        # the maker is the oldest order at the best price of the side being hit
+        side = self._random.choice(('buy', 'sell'))
+        prices = self._bids if side == 'buy' else self._asks
+        if not prices:
+            return []
+        price = max(prices) if side == 'buy' else min(prices)
+        level = self._book[(side, price)]
+        maker_id = next(iter(level))
+        size = min(level[maker_id], self._random_size())
+        self._trade_id += 1
+        messages = [self._message(type='match', trade_id=self._trade_id, maker_order_id=maker_id,
+                                  taker_order_id=self._order_id(), side=side,
+                                  size=self._size(size), price=self._price(price))]
+        if size == level[maker_id]:
+            self._unrest(maker_id)
+            messages.append(self._message(type='done', order_id=maker_id, side=side, reason='filled',
+                                          price=self._price(price), remaining_size=self._size(0)))
+        else:
+            level[maker_id] -= size
+        return messages
+
+    def _change(self):
+        if not self._ids:
+            return []
+        order_id = self._random.choice(self._ids)
+        side, price = self._orders[order_id]
+        level = self._book[(side, price)]
+        old_size = level[order_id]
+        new_size = max(old_size // 2, 1)
+        level[order_id] = new_size
+        return [self._message(type='change', order_id=order_id, side=side, price=self._price(price),
+                              old_size=self._size(old_size), new_size=self._size(new_size))]
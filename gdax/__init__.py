@@ -1,4 +1,18 @@
+import sys
+
 from gdax.authenticated_client import AuthenticatedClient
-from gdax.public_client import PublicClient
+from gdax.public_client import PublicClient, make_session
+from gdax.rate_limiter import RateLimiter
 from gdax.websocket_client import WebsocketClient
 from gdax.order_book import OrderBook
+from gdax.level2_order_book import Level2OrderBook
+from gdax.book_features import BookFeatures
+from gdax.book_verifier import BookVerifier
+from gdax.multi_order_book import MultiOrderBook
+from gdax.sharded import ShardedOrderBook
+from gdax.journal import JournalReader, JournalWriter
+from gdax.mongo_sink import MongoSink
+from gdax.replay import Replay
+
+if sys.version_info >= (3, 7):
+    from gdax.async_websocket_client import AsyncWebsocketClient
@@ -0,0 +1,174 @@
+#
+# gdax/async_websocket_client.py
+#
+# asyncio counterpart of WebsocketClient, for running many feeds on one event loop
+
+from __future__ import print_function
+import asyncio
+import inspect
+import json
+import time
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from gdax.websocket_client import subscribe_params
+
+
+class AsyncWebsocketClient(object):
+    """Subscribes to the gdax Websocket Feed from an asyncio event loop.
+
+    It takes the same subscription arguments and calls the same on_open,
+    on_message, on_close and on_error hooks as WebsocketClient, but reads
+    the socket in a coroutine instead of a thread of its own, so any number
+    of feeds, REST calls run in executors and the trading loop can share one
+    event loop. A hook may also be a coroutine function, in which case it is
+    awaited before the next message is read.
+
+    `start()` schedules `run()` as a task on the current event loop and
+    `close()` stops it. Alternatively, after `connect()` the client is an
+    async iterator of the decoded messages:
+
+        feed = AsyncWebsocketClient(products=['BTC-USD'], channels=['ticker'])
+        await feed.connect()
+        async for msg in feed:
+            ...
+
+    Requires the optional `websockets` package, which also answers the
+    server's pings and pings it in turn to keep the connection alive.
+
+    Args:
+        url (Optional[str]): Websocket Feed endpoint.
+        products (Optional[list]): Product ids to subscribe to.
+        channels (Optional[list]): Channels to subscribe to, all product
+            channels if None.
+        auth (Optional[bool]): Sign the subscription with the API key, to
+            receive the messages of your own orders.
+        journal (Optional[JournalWriter]): Records every raw frame as it is
+            received.
+
+    """
+
+    def __init__(self, url="wss://ws-feed.gdax.com", products=None, should_print=True, auth=False, api_key="",
+                 api_secret="", api_passphrase="", channels=None, journal=None):
+        self.url = url
+        self.products = products
+        self.channels = channels
+        self.stop = False
+        self.error = None
+        self.ws = None
+        self.task = None
+        self.auth = auth
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.api_passphrase = api_passphrase
+        self.should_print = should_print
+        self.journal = journal
+
+    def start(self):
+        ''' Schedules run() on the current event loop and returns its task. '''
+        self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    async def run(self):
+        ''' Connects and calls on_message with every message until the client is closed, the connection drops or
+        on_error stops it. '''
+        await self.connect()
+        try:
+            async for msg in self.messages():
+                try:
+                    await self._call(self.on_message, msg)
+                except Exception as e:
+                    await self._call(self.on_error, e, msg)
+        finally:
+            await self._disconnect()
+
+    async def connect(self):
+        self.stop = False
+        await self._call(self.on_open)
+        if self.products is None:
+            self.products = ["BTC-USD"]
+        elif not isinstance(self.products, list):
+            self.products = [self.products]
+
+        if self.url[-1] == "/":
+            self.url = self.url[:-1]
+
+        self.ws = await self._open_socket()
+        await self.ws.send(json.dumps(subscribe_params(self.products, self.channels, self.auth, self.api_key,
+                                                       self.api_secret, self.api_passphrase)))
+
+    async def _open_socket(self):
+        if websockets is None:
+            raise ImportError('AsyncWebsocketClient requires the websockets package')
+        # level2 snapshots of busy products exceed the default 1 MiB frame limit
+        return await websockets.connect(self.url, max_size=None)
+
+    def __aiter__(self):
+        return self.messages()
+
+    async def messages(self):
+        ''' Yields every decoded message until the client is closed or the connection drops, which is passed to
+        on_error. Frames that fail to decode go to on_error too. '''
+        while not self.stop:
+            try:
+                data = await self.ws.recv()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # close() ends a pending recv with ConnectionClosed
+                if not self.stop:
+                    await self._call(self.on_error, e)
+                # a closed connection fails every recv at once, so retrying would spin the event loop
+                return
+            received_at = time.time()
+            if self.journal is not None:
+                self.journal.write(data, received_at)
+            try:
+                msg = json.loads(data)
+            except ValueError as e:
+                await self._call(self.on_error, e, data)
+            else:
+                yield msg
+
+    async def close(self):
+        ''' Stops the client and, unless called from within run(), waits for it to finish. '''
+        self.stop = True
+        if self.ws is not None:
+            await self.ws.close()
+        if self.task is not None and self.task is not asyncio.current_task():
+            await asyncio.wait([self.task])
+        if self.journal is not None:
+            self.journal.flush()
+
+    async def _disconnect(self):
+        try:
+            if self.ws is not None:
+                await self.ws.close()
+        finally:
+            await self._call(self.on_close)
+
+    @staticmethod
+    async def _call(hook, *args):
+        result = hook(*args)
+        if inspect.isawaitable(result):
+            await result
+
+    def on_open(self):
+        if self.should_print:
+            print("-- Subscribed! --\n")
+
+    def on_close(self):
+        if self.should_print:
+            print("\n-- Socket Closed --")
+
+    def on_message(self, msg):
+        if self.should_print:
+            print(msg)
+
+    def on_error(self, e, data=None):
+        self.error = e
+        self.stop = True
+        print('{} - data: {}'.format(e, data))
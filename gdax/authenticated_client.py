@@ -7,7 +7,6 @@
 import hmac
 import hashlib
 import time
-import requests
 import base64
 import json
 from requests.auth import AuthBase
@@ -16,13 +15,13 @@ from gdax.gdax_auth import GdaxAuth
 
 
 class AuthenticatedClient(PublicClient):
-    def __init__(self, key, b64secret, passphrase, api_url="https://api.gdax.com", timeout=30):
-        super(AuthenticatedClient, self).__init__(api_url)
+    def __init__(self, key, b64secret, passphrase, api_url="https://api.gdax.com", timeout=30, session=None,
+                 rate_limiter=None):
+        super(AuthenticatedClient, self).__init__(api_url, timeout, session, rate_limiter)
         self.auth = GdaxAuth(key, b64secret, passphrase)
-        self.timeout = timeout
 
     def get_account(self, account_id):
-        r = requests.get(self.url + '/accounts/' + account_id, auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + '/accounts/' + account_id, auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -31,7 +30,7 @@ class AuthenticatedClient(PublicClient):
 
     def get_account_history(self, account_id):
         result = []
-        r = requests.get(self.url + '/accounts/{}/ledger'.format(account_id), auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + '/accounts/{}/ledger'.format(account_id), auth=self.auth)
         # r.raise_for_status()
         result.append(r.json())
         if "cb-after" in r.headers:
@@ -39,7 +38,7 @@ class AuthenticatedClient(PublicClient):
         return result
 
     def history_pagination(self, account_id, result, after):
-        r = requests.get(self.url + '/accounts/{}/ledger?after={}'.format(account_id, str(after)), auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + '/accounts/{}/ledger?after={}'.format(account_id, str(after)), auth=self.auth)
         # r.raise_for_status()
         if r.json():
             result.append(r.json())
@@ -49,7 +48,7 @@ class AuthenticatedClient(PublicClient):
 
     def get_account_holds(self, account_id):
         result = []
-        r = requests.get(self.url + '/accounts/{}/holds'.format(account_id), auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + '/accounts/{}/holds'.format(account_id), auth=self.auth)
         # r.raise_for_status()
         result.append(r.json())
         if "cb-after" in r.headers:
@@ -57,7 +56,7 @@ class AuthenticatedClient(PublicClient):
         return result
 
     def holds_pagination(self, account_id, result, after):
-        r = requests.get(self.url + '/accounts/{}/holds?after={}'.format(account_id, str(after)), auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + '/accounts/{}/holds?after={}'.format(account_id, str(after)), auth=self.auth)
         # r.raise_for_status()
         if r.json():
             result.append(r.json())
@@ -69,22 +68,20 @@ class AuthenticatedClient(PublicClient):
         kwargs["side"] = "buy"
         if "product_id" not in kwargs:
             kwargs["product_id"] = self.product_id
-        r = requests.post(self.url + '/orders',
-                          data=json.dumps(kwargs),
-                          auth=self.auth,
-                          timeout=self.timeout)
+        r = self._send('post', self.url + '/orders',
+                       data=json.dumps(kwargs),
+                       auth=self.auth)
         return r.json()
 
     def sell(self, **kwargs):
         kwargs["side"] = "sell"
-        r = requests.post(self.url + '/orders',
-                          data=json.dumps(kwargs),
-                          auth=self.auth,
-                          timeout=self.timeout)
+        r = self._send('post', self.url + '/orders',
+                       data=json.dumps(kwargs),
+                       auth=self.auth)
         return r.json()
 
     def cancel_order(self, order_id):
-        r = requests.delete(self.url + '/orders/' + order_id, auth=self.auth, timeout=self.timeout)
+        r = self._send('delete', self.url + '/orders/' + order_id, auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -93,12 +90,12 @@ class AuthenticatedClient(PublicClient):
         params = {}
         if product_id:
             params["product_id"] = product_id
-        r = requests.delete(url, auth=self.auth, params=params, timeout=self.timeout)
+        r = self._send('delete', url, auth=self.auth, params=params)
         # r.raise_for_status()
         return r.json()
 
     def get_order(self, order_id):
-        r = requests.get(self.url + '/orders/' + order_id, auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + '/orders/' + order_id, auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -110,7 +107,7 @@ class AuthenticatedClient(PublicClient):
             params["product_id"] = product_id
         if status:
             params["status"] = status
-        r = requests.get(url, auth=self.auth, params=params, timeout=self.timeout)
+        r = self._send('get', url, auth=self.auth, params=params)
         # r.raise_for_status()
         result.append(r.json())
         if 'cb-after' in r.headers:
@@ -127,7 +124,7 @@ class AuthenticatedClient(PublicClient):
             params["product_id"] = product_id
         if status:
             params["status"] = status
-        r = requests.get(url, auth=self.auth, params=params, timeout=self.timeout)
+        r = self._send('get', url, auth=self.auth, params=params)
         # r.raise_for_status()
         if r.json():
             result.append(r.json())
@@ -148,7 +145,7 @@ class AuthenticatedClient(PublicClient):
             url += "after={}&".format(str(after))
         if limit:
             url += "limit={}&".format(str(limit))
-        r = requests.get(url, auth=self.auth, timeout=self.timeout)
+        r = self._send('get', url, auth=self.auth)
         # r.raise_for_status()
         result.append(r.json())
         if 'cb-after' in r.headers and limit is not len(r.json()):
@@ -161,7 +158,7 @@ class AuthenticatedClient(PublicClient):
             url += "order_id={}&".format(str(order_id))
         if product_id:
             url += "product_id={}&".format(product_id)
-        r = requests.get(url, auth=self.auth, timeout=self.timeout)
+        r = self._send('get', url, auth=self.auth)
         # r.raise_for_status()
         if r.json():
             result.append(r.json())
@@ -177,7 +174,7 @@ class AuthenticatedClient(PublicClient):
             url += "status={}&".format(str(status))
         if after:
             url += 'after={}&'.format(str(after))
-        r = requests.get(url, auth=self.auth, timeout=self.timeout)
+        r = self._send('get', url, auth=self.auth)
         # r.raise_for_status()
         result.append(r.json())
         if 'cb-after' in r.headers:
@@ -189,7 +186,7 @@ class AuthenticatedClient(PublicClient):
             "amount": amount,
             "currency": currency  # example: USD
         }
-        r = requests.post(self.url + "/funding/repay", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + "/funding/repay", data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -200,12 +197,12 @@ class AuthenticatedClient(PublicClient):
             "currency": currency,  # example: USD
             "amount": amount
         }
-        r = requests.post(self.url + "/profiles/margin-transfer", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + "/profiles/margin-transfer", data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_position(self):
-        r = requests.get(self.url + "/position", auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + "/position", auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -213,7 +210,7 @@ class AuthenticatedClient(PublicClient):
         payload = {
             "repay_only": repay_only or False
         }
-        r = requests.post(self.url + "/position/close", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + "/position/close", data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -223,7 +220,7 @@ class AuthenticatedClient(PublicClient):
             "currency": currency,
             "payment_method_id": payment_method_id
         }
-        r = requests.post(self.url + "/deposits/payment-method", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + "/deposits/payment-method", data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -233,7 +230,7 @@ class AuthenticatedClient(PublicClient):
             "currency": currency,
             "coinbase_account_id": coinbase_account_id
         }
-        r = requests.post(self.url + "/deposits/coinbase-account", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + "/deposits/coinbase-account", data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -243,7 +240,7 @@ class AuthenticatedClient(PublicClient):
             "currency": currency,
             "payment_method_id": payment_method_id
         }
-        r = requests.post(self.url + "/withdrawals/payment-method", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + "/withdrawals/payment-method", data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -253,7 +250,7 @@ class AuthenticatedClient(PublicClient):
             "currency": currency,
             "coinbase_account_id": coinbase_account_id
         }
-        r = requests.post(self.url + "/withdrawals/coinbase-account", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + "/withdrawals/coinbase-account", data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -263,17 +260,17 @@ class AuthenticatedClient(PublicClient):
             "currency": currency,
             "crypto_address": crypto_address
         }
-        r = requests.post(self.url + "/withdrawals/crypto", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + "/withdrawals/crypto", data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_payment_methods(self):
-        r = requests.get(self.url + "/payment-methods", auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + "/payment-methods", auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_coinbase_accounts(self):
-        r = requests.get(self.url + "/coinbase-accounts", auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + "/coinbase-accounts", auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
@@ -288,21 +285,21 @@ class AuthenticatedClient(PublicClient):
             "format": report_format,
             "email": email
         }
-        r = requests.post(self.url + "/reports", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + "/reports", data=json.dumps(payload), auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_report(self, report_id=""):
-        r = requests.get(self.url + "/reports/" + report_id, auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + "/reports/" + report_id, auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_trailing_volume(self):
-        r = requests.get(self.url + "/users/self/trailing-volume", auth=self.auth, timeout=self.timeout)
+        r = self._send('get', self.url + "/users/self/trailing-volume", auth=self.auth)
         # r.raise_for_status()
         return r.json()
 
     def get_deposit_address(self, account_id):
-        r = requests.post(self.url + '/coinbase-accounts/{}/addresses'.format(account_id), auth=self.auth, timeout=self.timeout)
+        r = self._send('post', self.url + '/coinbase-accounts/{}/addresses'.format(account_id), auth=self.auth)
         # r.raise_for_status()
         return r.json()
@@ -0,0 +1,137 @@
+#
+# gdax/book_features.py
+#
+# Microstructure features kept up to date incrementally by an OrderBook
+
+from collections import deque, namedtuple
+
+
+BookFeatureValues = namedtuple('BookFeatureValues', [
+    'bid', 'bid_size', 'ask', 'ask_size', 'spread', 'mid', 'microprice', 'imbalance', 'trade_flow_imbalance'])
+
+
+class BookFeatures(object):
+    """Best bid/ask, spread, microprice, depth imbalance and trade flow of a book.
+
+    Attach to an OrderBook or Level2OrderBook with
+    `OrderBook(features=BookFeatures())`; the book calls `update` or
+    `update_levels` on its feed thread after applying each message.
+    Only messages that touch a price inside the best `depth` levels of a
+    side or that are trades change the features, so most messages deep in
+    the book cost a single comparison. The top-N sums are recomputed only
+    when such a level changes, and the trade flow keeps running sums over
+    a window of the last `trade_window` trades.
+
+    Readers use `current`, a BookFeatureValues that is replaced as a whole
+    on every change and so always holds values from the same book state.
+    Values are floats, or None while a side of the book is empty.
+
+    Args:
+        depth (Optional[int]): Levels per side in the depth imbalance.
+        trade_window (Optional[int]): Trades in the trade flow imbalance.
+
+    """
+
+    def __init__(self, depth=5, trade_window=100):
+        self.depth = depth
+        self.trade_window = trade_window
+        self.current = BookFeatureValues(*([None] * len(BookFeatureValues._fields)))
+        self._trades = deque()
+        self._buy_volume = 0.0
+        self._sell_volume = 0.0
+        self._bid_depth = 0.0
+        self._ask_depth = 0.0
+        # price keys of the deepest level counted in each side's depth, None while a side has fewer levels than
+        # `depth` and every change can move the window
+        self._bid_floor = None
+        self._ask_ceiling = None
+
+    def reset(self, book):
+        """Recomputes every feature from `book` and forgets the trade window, after a snapshot load."""
+        self._trades.clear()
+        self._buy_volume = 0.0
+        self._sell_volume = 0.0
+        self._refresh_bids(book)
+        self._refresh_asks(book)
+        self._publish(book)
+
+    def update(self, book, message):
+        """Updates the features after `book` applied `message`."""
+        msg_type = message['type']
+        changed = False
+        if msg_type == 'match':
+            self._add_trade(book, message)
+            changed = True
+        elif msg_type not in ('open', 'done', 'change'):
+            return
+        price = message.get('price')
+        if price is not None:
+            changed = self._touch(book, message['side'], book._format.price(price)) or changed
+        if changed:
+            self._publish(book)
+
+    def update_levels(self, book, levels):
+        """Updates the features after `book` changed the levels given as (side, price) pairs, with prices in the
+        book's internal format."""
+        changed = False
+        for side, price in levels:
+            changed = self._touch(book, side, price) or changed
+        if changed:
+            self._publish(book)
+
+    def _touch(self, book, side, price):
+        if side == 'buy':
+            if self._bid_floor is None or price >= self._bid_floor:
+                self._refresh_bids(book)
+                return True
+        elif self._ask_ceiling is None or price <= self._ask_ceiling:
+            self._refresh_asks(book)
+            return True
+        return False
+
+    def _add_trade(self, book, message):
+        # the side of a match is the maker's, so a resting sell was lifted by a buyer
+        size = book._format.size_float(book._format.size(message['size']))
+        buy = message['side'] == 'sell'
+        self._trades.append((buy, size))
+        if buy:
+            self._buy_volume += size
+        else:
+            self._sell_volume += size
+        if len(self._trades) > self.trade_window:
+            buy, size = self._trades.popleft()
+            if buy:
+                self._buy_volume -= size
+            else:
+                self._sell_volume -= size
+
+    def _refresh_bids(self, book):
+        levels = list(book._level_items('buy', self.depth))
+        self._bid_depth = book._format.size_float(sum(size for _, size, _ in levels))
+        self._bid_floor = levels[-1][0] if len(levels) == self.depth else None
+
+    def _refresh_asks(self, book):
+        levels = list(book._level_items('sell', self.depth))
+        self._ask_depth = book._format.size_float(sum(size for _, size, _ in levels))
+        self._ask_ceiling = levels[-1][0] if len(levels) == self.depth else None
+
+    def _publish(self, book):
+        fmt = book._format
+        bid = bid_size = ask = ask_size = spread = mid = microprice = None
+        best = book._best('buy')
+        if best is not None:
+            bid, bid_size = fmt.price_float(best[0]), fmt.size_float(best[1])
+        best = book._best('sell')
+        if best is not None:
+            ask, ask_size = fmt.price_float(best[0]), fmt.size_float(best[1])
+        if bid is not None and ask is not None:
+            spread = ask - bid
+            mid = (bid + ask) / 2
+            # the touch price the next trade is more likely to print at, weighted towards the thinner side
+            microprice = (bid * ask_size + ask * bid_size) / (bid_size + ask_size) if bid_size + ask_size else mid
+        depth = self._bid_depth + self._ask_depth
+        volume = self._buy_volume + self._sell_volume
+        self.current = BookFeatureValues(
+            bid, bid_size, ask, ask_size, spread, mid, microprice,
+            (self._bid_depth - self._ask_depth) / depth if depth else None,
+            (self._buy_volume - self._sell_volume) / volume if volume else None)
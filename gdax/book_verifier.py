@@ -0,0 +1,162 @@
+#
+# gdax/book_verifier.py
+#
+# Periodic checks of a live OrderBook against level 2 REST snapshots
+
+from __future__ import print_function
+from collections import namedtuple
+from threading import Event, Thread
+import time
+
+
+DriftReport = namedtuple('DriftReport', ['sequence', 'levels', 'mismatched_levels', 'size_drift', 'resynced'])
+
+
+class BookVerifier(object):
+    """Periodically compares the best levels of an OrderBook with a level 2 snapshot.
+
+    Each check fetches `get_product_order_book(level=2)`, which is cheap
+    next to the level 3 book, and compares its best `depth` levels per side
+    with the local book as it was at the snapshot's sequence. The feed is
+    usually ahead of the REST response, so while a check is in progress
+    the book logs the prior size and count of every level a message is
+    about to change, and the verifier rewinds those levels instead of
+    pausing the feed thread. A check that cannot line up the sequences,
+    because the book resynced meanwhile, fell too far behind or logged
+    more than `max_log` changes, is counted as inconclusive.
+
+    The book is only reloaded from a level 3 snapshot when more than
+    `max_mismatched_levels` levels differ.
+
+    Args:
+        book (OrderBook): Book to verify. Its `_client` fetches the
+            snapshots.
+        interval (Optional[float]): Seconds between checks.
+        depth (Optional[int]): Levels per side to compare, at most 50.
+        max_mismatched_levels (Optional[int]): Differing levels tolerated
+            before resyncing.
+        max_log (Optional[int]): Most level changes to log in one check.
+        timeout (Optional[float]): Seconds to wait for the book to reach
+            the sequence of a snapshot.
+
+    """
+
+    def __init__(self, book, interval=60.0, depth=10, max_mismatched_levels=0, max_log=100000, timeout=10.0):
+        self.book = book
+        self.interval = interval
+        self.depth = depth
+        self.max_mismatched_levels = max_mismatched_levels
+        self.max_log = max_log
+        self.timeout = timeout
+        self.checks = 0
+        self.inconclusive = 0
+        self.resyncs = 0
+        self.last_report = None
+        self._stopped = Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print('Error: could not verify the order book ({}).'.format(e))
+
+    def check(self):
+        """Runs one check and returns its DriftReport, or None if it was inconclusive."""
+        book = self.book
+        self.checks += 1
+        if book._sequence == -1 or book._resyncing:
+            self.inconclusive += 1
+            return None
+
+        change_log = []
+        book._change_log = change_log
+        try:
+            # every message the book applied without logging is at or below this sequence
+            logged_from = book._read_consistent(lambda: book._sequence)[1]
+            res = book._client.get_product_order_book(product_id=book.product_id, level=2)
+            sequence = res['sequence']
+            local = self._local_levels(change_log, logged_from, sequence)
+        finally:
+            if book._change_log is change_log:
+                book._change_log = None
+        if local is None:
+            self.inconclusive += 1
+            return None
+
+        report = self._compare(sequence, res, local)
+        if report.resynced:
+            self.resyncs += 1
+            print('Error: order book drifted from the exchange at {} ({} of {} levels differ). '
+                  'Re-initializing book.'.format(sequence, report.mismatched_levels, report.levels))
+            book.request_resync()
+        self.last_report = report
+        return report
+
+    def _local_levels(self, change_log, logged_from, sequence):
+        ''' Returns the best levels of each side as of `sequence`, or None if the book cannot be rewound to it. '''
+        book = self.book
+        if sequence < logged_from:
+            return None
+        deadline = time.time() + self.timeout
+        while book._sequence < sequence:
+            if time.time() > deadline or len(change_log) > self.max_log or book._change_log is not change_log:
+                return None
+            time.sleep(0.01)
+        if len(change_log) > self.max_log:
+            return None
+        levels = book._read_consistent(lambda: self._rewind(change_log, sequence))[1]
+        if book._change_log is not change_log:
+            # a snapshot replaced the book while it was being read
+            return None
+        return levels
+
+    def _rewind(self, change_log, sequence):
+        # the state of a level at `sequence` is its state before the first change logged after it
+        restored = {}
+        for entry_sequence, side, price, size, count in change_log:
+            if entry_sequence > sequence and (side, price) not in restored:
+                restored[(side, price)] = (size, count)
+        levels = []
+        for side in ('buy', 'sell'):
+            # levels that are new since `sequence` can push at most len(restored) of its best levels deeper
+            current = dict((price, (size, count))
+                           for price, size, count in self.book._level_items(side, self.depth + len(restored)))
+            for (level_side, price), state in restored.items():
+                if level_side == side:
+                    current[price] = state
+            prices = sorted((price for price, state in current.items() if state[1]), reverse=(side == 'buy'))
+            levels.append([(price, current[price][0], current[price][1]) for price in prices[:self.depth]])
+        return levels
+
+    def _compare(self, sequence, res, local):
+        fmt = self.book._format
+        compared = 0
+        mismatched = 0
+        drift = 0
+        total = 0
+        for rows, levels in zip((res['bids'], res['asks']), local):
+            remote = [(fmt.price(row[0]), fmt.size(row[1]), int(row[2])) for row in rows[:self.depth]]
+            compared += max(len(remote), len(levels))
+            for i in range(max(len(remote), len(levels))):
+                if i >= len(remote) or i >= len(levels) or remote[i] != levels[i]:
+                    mismatched += 1
+            remote_sizes = dict((price, size) for price, size, _ in remote)
+            local_sizes = dict((price, size) for price, size, _ in levels)
+            for price in set(remote_sizes) | set(local_sizes):
+                drift += abs(remote_sizes.get(price, 0) - local_sizes.get(price, 0))
+            total += sum(remote_sizes.values())
+        size_drift = fmt.size_float(drift) / fmt.size_float(total) if total else 0.0
+        return DriftReport(sequence, compared, mismatched, size_drift, mismatched > self.max_mismatched_levels)
@@ -0,0 +1,316 @@
+#
+# gdax/journal.py
+#
+# Append-only binary journal of raw websocket frames, written from a background thread
+
+import bisect
+import json
+import os
+import re
+import struct
+import time
+from threading import Thread
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+# Every record is the frame length and the local receive time, followed by the raw frame bytes
+RECORD_HEADER = struct.Struct('<Id')
+
+_SEQUENCE = re.compile(br'"sequence":\s*(\d+)')
+_CLOSE = object()
+_FLUSH = object()
+
+
+def _journal_file(path, number):
+    return os.path.join(path, 'journal-{:06d}.bin'.format(number))
+
+
+def _index_file(path, number):
+    return os.path.join(path, 'journal-{:06d}.idx'.format(number))
+
+
+def _snapshot_file(path, product_id, sequence):
+    return os.path.join(path, 'snapshot-{}-{}.json'.format(product_id, sequence))
+
+
+def open_journal(log_to):
+    """Returns the JournalWriter for the `log_to` argument of the order
+    books: None, a JournalWriter, or the directory to open one in. Writable
+    files, which the books used to pickle messages to, are rejected since a
+    journal needs a directory to rotate and index its files in.
+
+    """
+    if log_to is None or isinstance(log_to, JournalWriter):
+        return log_to
+    if isinstance(log_to, str):
+        return JournalWriter(log_to)
+    raise TypeError('log_to must be a JournalWriter or a directory path, not {}'.format(type(log_to).__name__))
+
+
+class JournalWriter(object):
+    """Records raw websocket frames to numbered journal files.
+
+    `write` only queues the frame, so the receive thread never touches the
+    disk. A background thread encodes queued frames in batches, appends them
+    and flushes at most every `flush_interval` seconds. Files are rotated
+    once they reach `max_file_size` bytes. Every `index_interval` records,
+    the file offset, receive time and sequence number are added to an index
+    next to each file so that JournalReader can seek without scanning.
+
+    """
+
+    def __init__(self, path, max_file_size=256 * 1024 * 1024, flush_interval=1.0, index_interval=1000,
+                 batch_size=1000):
+        """Open a journal in `path`, continuing after any files already there.
+
+        Args:
+            path (str): Directory holding the journal files.
+            max_file_size (Optional[int]): Size in bytes after which a new
+                file is started.
+            flush_interval (Optional[float]): Maximum seconds between flushes.
+            index_interval (Optional[int]): Records between index entries.
+            batch_size (Optional[int]): Maximum frames written per batch.
+
+        """
+        self.path = path
+        self.max_file_size = max_file_size
+        self.flush_interval = flush_interval
+        self.index_interval = index_interval
+        self.batch_size = batch_size
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._number = max(JournalReader(path).files or [0])
+        self._file = None
+        self._index = None
+        self._records = 0
+        self._queue = queue.Queue()
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, frame, timestamp=None):
+        """Queue a raw frame received at `timestamp` (defaults to now)."""
+        self._queue.put((frame, time.time() if timestamp is None else timestamp))
+
+    def write_snapshot(self, product_id, snapshot):
+        """Store a level-3 order book snapshot, as returned by
+        `get_product_order_book`, so that a replay can seed its book from it.
+        Written directly by the calling thread.
+
+        """
+        path = _snapshot_file(self.path, product_id, snapshot['sequence'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.rename(path + '.tmp', path)
+
+    def record_snapshot(self, product_id):
+        """Returns a SnapshotRecorder to pass as the `tee` of
+        `PublicClient.stream_product_order_book`, which stores the raw
+        response body as a snapshot without decoding it a second time.
+
+        """
+        return SnapshotRecorder(self.path, product_id)
+
+    def flush(self):
+        """Block until every queued frame is on disk."""
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def _open_next(self):
+        self._close_files()
+        self._number += 1
+        self._file = open(_journal_file(self.path, self._number), 'ab')
+        self._index = open(_index_file(self.path, self._number), 'a')
+        self._records = 0
+
+    def _close_files(self):
+        if self._file is not None:
+            self._file.close()
+            self._index.close()
+
+    def _run(self):
+        self._open_next()
+        last_flush = time.time()
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            closing = _CLOSE in batch
+            # frames queued before a flush request are in this batch or an earlier one
+            flushing = closing or _FLUSH in batch
+            self._write_batch([record for record in batch if record is not _CLOSE and record is not _FLUSH])
+            now = time.time()
+            if flushing or now - last_flush >= self.flush_interval:
+                self._file.flush()
+                self._index.flush()
+                last_flush = now
+            for _ in batch:
+                self._queue.task_done()
+            if closing:
+                self._close_files()
+                return
+
+    def _write_batch(self, batch):
+        chunk = bytearray()
+        offset = self._file.tell()
+        for frame, timestamp in batch:
+            if not isinstance(frame, bytes):
+                frame = frame.encode('utf-8')
+            if self._records % self.index_interval == 0:
+                match = _SEQUENCE.search(frame)
+                self._index.write('{} {!r} {}\n'.format(offset + len(chunk), timestamp,
+                                                       int(match.group(1)) if match else -1))
+            chunk += RECORD_HEADER.pack(len(frame), timestamp)
+            chunk += frame
+            self._records += 1
+            if offset + len(chunk) >= self.max_file_size:
+                self._file.write(chunk)
+                self._open_next()
+                chunk = bytearray()
+                offset = 0
+        self._file.write(chunk)
+
+
+class SnapshotRecorder(object):
+    """Writes the raw body of a snapshot response to a temporary file as it
+    downloads. `commit` names it after the snapshot's sequence number, which
+    is only known once parsed; `abort` discards an incomplete download.
+
+    """
+
+    def __init__(self, path, product_id):
+        self.path = path
+        self.product_id = product_id
+        self._tmp = os.path.join(path, 'snapshot-{}.partial'.format(product_id))
+        self._file = open(self._tmp, 'wb')
+
+    def write(self, data):
+        self._file.write(data)
+
+    def commit(self, sequence):
+        self._file.close()
+        os.rename(self._tmp, _snapshot_file(self.path, self.product_id, sequence))
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp)
+
+
+class JournalReader(object):
+    """Reads the frames recorded by JournalWriter back in order."""
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def files(self):
+        """Numbers of the journal files, oldest first."""
+        if not os.path.isdir(self.path):
+            return []
+        numbers = [int(name[8:14]) for name in os.listdir(self.path)
+                   if name.startswith('journal-') and name.endswith('.bin')]
+        return sorted(numbers)
+
+    def snapshots(self, product_id):
+        """Sequence numbers of the stored snapshots of `product_id`, oldest first."""
+        prefix = 'snapshot-{}-'.format(product_id)
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(int(name[len(prefix):-5]) for name in os.listdir(self.path)
+                      if name.startswith(prefix) and name.endswith('.json'))
+
+    def load_snapshot(self, product_id, sequence):
+        with open(_snapshot_file(self.path, product_id, sequence)) as f:
+            return json.load(f)
+
+    def index(self):
+        """Returns the index entries of every file as (timestamp, sequence, number, offset), oldest first."""
+        entries = []
+        for number in self.files:
+            try:
+                with open(_index_file(self.path, number)) as f:
+                    for line in f:
+                        offset, timestamp, sequence = line.split()
+                        entries.append((float(timestamp), int(sequence), number, int(offset)))
+            except IOError:
+                entries.append((0.0, -1, number, 0))
+        return entries
+
+    def read(self, start_time=None, start_sequence=None):
+        """Yields (timestamp, frame) for every recorded frame.
+
+        With `start_time` or `start_sequence`, reading starts at the closest
+        index entry before that point, skipping the frames in between.
+        Sequence seeks assume the journal holds a single product's feed,
+        as written by OrderBook.
+
+        Args:
+            start_time (Optional[float]): Skip frames received before this
+                epoch time.
+            start_sequence (Optional[int]): Skip frames up to the one with
+                this sequence number.
+
+        """
+        number, offset = self._seek(start_time, start_sequence)
+        for n in self.files:
+            if n < number:
+                continue
+            for timestamp, frame in self._read_file(n, offset if n == number else 0):
+                if start_time is not None and timestamp < start_time:
+                    continue
+                if start_sequence is not None:
+                    match = _SEQUENCE.search(frame)
+                    if match is None or int(match.group(1)) < start_sequence:
+                        continue
+                    start_sequence = None
+                start_time = None
+                yield timestamp, frame
+
+    def __iter__(self):
+        return self.read()
+
+    def _seek(self, start_time, start_sequence):
+        if start_time is None and start_sequence is None:
+            return 0, 0
+        entries = self.index()
+        if start_time is not None:
+            keys = [entry[0] for entry in entries]
+            target = start_time
+        else:
+            entries = [entry for entry in entries if entry[1] >= 0]
+            keys = [entry[1] for entry in entries]
+            target = start_sequence
+        # the last entry strictly before the target, so the target frame itself is never skipped
+        i = bisect.bisect_left(keys, target) - 1
+        if i < 0:
+            return 0, 0
+        return entries[i][2], entries[i][3]
+
+    def _read_file(self, number, offset):
+        with open(_journal_file(self.path, number), 'rb') as f:
+            f.seek(offset)
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                length, timestamp = RECORD_HEADER.unpack(header)
+                frame = f.read(length)
+                if len(frame) < length:
+                    # a record cut short by a crash while writing
+                    return
+                yield timestamp, frame
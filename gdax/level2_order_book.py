@@ -0,0 +1,152 @@
+#
+# gdax/level2_order_book.py
+#
+# Live aggregated order book updated from the gdax level2 Websocket channel
+
+from __future__ import print_function
+from sortedcontainers import SortedDict
+
+from gdax.order_book import _BaseOrderBook
+
+
+class Level2OrderBook(_BaseOrderBook):
+    def __init__(self, product_id='BTC-USD', log_to=None, fixed_point=False, quote_increment=None,
+                 base_increment=None, features=None, **client_kwargs):
+        ''' Tracks only the aggregate size resting at each price, from the `level2` channel, and the last trade
+        from the `matches` channel. Each price level costs one entry in a price -> size tree instead of an object
+        per resting order, and the channel sends one update per level change instead of several messages per
+        order, so many products can be tracked for a fraction of the memory and traffic of an OrderBook.
+
+        The arguments are those of OrderBook. The level2 channel does not report how many orders rest at a level,
+        so num-orders is None in get_depth and get_snapshot and NaN in get_depth_arrays. '''
+        super(Level2OrderBook, self).__init__(product_id, log_to, fixed_point, quote_increment, base_increment,
+                                              features, channels=['level2', 'matches'], **client_kwargs)
+        self._appliers = {'l2update': self._apply_update, 'snapshot': self.load_snapshot, 'match': self._apply_match}
+
+    def on_open(self):
+        self._sequence = -1
+        print("-- Subscribed to Level2OrderBook! --\n")
+
+    def on_reconnect(self):
+        # the channel sends a fresh snapshot on resubscribing, until then updates fall back to the REST one
+        self._sequence = -1
+
+    def on_close(self):
+        print("\n-- Level2OrderBook Socket Closed! --")
+
+    def reset_book(self):
+        ''' Seeds the book from the level 2 REST snapshot. The channel sends its own full snapshot on subscribing,
+        which replaces it; the REST one, limited to the best 50 levels, only covers a missed channel snapshot. '''
+        res = self._client.get_product_order_book(product_id=self.product_id, level=2)
+        if self.journal is not None:
+            self.journal.write_snapshot(self.product_id, res)
+        self.load_snapshot(res)
+
+    def load_snapshot(self, res):
+        ''' Replaces the book with a level 2 `get_product_order_book` response or a level2 channel `snapshot`
+        message, whose levels are [price, size, num-orders] and [price, size] respectively. '''
+        if self._format is None:
+            self._format = self._load_tick_format()
+        price = self._format.price
+        size = self._format.size
+        bids = SortedDict((price(level[0]), size(level[1])) for level in res['bids'])
+        asks = SortedDict((price(level[0]), size(level[1])) for level in res['asks'])
+        if self._reader_waiting:
+            self._wait_for_reader()
+        self._version += 1
+        try:
+            self._bids = bids
+            self._asks = asks
+            # level2 updates carry no sequence numbers, so past the snapshot the sequence only counts updates
+            self._sequence = res.get('sequence', 0)
+        finally:
+            self._version += 1
+        self._after_reset()
+
+    def on_message(self, message):
+        apply = self._appliers.get(message['type'])
+        if apply is not None:
+            apply(message)
+
+    def _apply_update(self, message):
+        if self._sequence == -1:
+            # the channel snapshot was missed, fall back to the REST one
+            self.reset_book()
+        self._update(message['changes'])
+
+    def _apply_match(self, message):
+        self._current_ticker = message
+        if self.features is not None:
+            self.features.update(self, message)
+
+    def _update(self, changes):
+        ''' Applies the [side, price, size] changes of an l2update, where a size of zero removes the level. '''
+        price = self._format.price
+        size = self._format.size
+        levels = []
+        if self._reader_waiting:
+            self._wait_for_reader()
+        self._version += 1
+        try:
+            for side, level_price, level_size in changes:
+                tree = self._bids if side == 'buy' else self._asks
+                key = price(level_price)
+                value = size(level_size)
+                if value:
+                    tree[key] = value
+                else:
+                    tree.pop(key, None)
+                levels.append((side, key))
+            self._sequence += 1
+        finally:
+            self._version += 1
+        if self.features is not None:
+            self.features.update_levels(self, levels)
+        if self._top_listeners:
+            self._update_top()
+
+    def _best(self, side):
+        if side == 'buy':
+            return self._bids.peekitem(-1) if self._bids else None
+        return self._asks.peekitem(0) if self._asks else None
+
+    def _level_items(self, side, n=None):
+        if side == 'buy':
+            levels = self._bids.items()
+            levels = reversed(levels if n is None else levels[-n:])
+        else:
+            levels = self._asks.items()
+            if n is not None:
+                levels = levels[:n]
+        return ((price, size, None) for price, size in levels)
+
+    def get_level(self, price):
+        ''' Returns [size, None] aggregated at `price`, or None if nothing rests there. '''
+        key = self._format.price(str(price))
+        size = self._read_consistent(lambda: self._bids.get(key) or self._asks.get(key))[1]
+        if size is None:
+            return None
+        return [self._format.to_size(size), None]
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    import datetime as dt
+
+    order_book = Level2OrderBook()
+    order_book.add_top_of_book_listener(
+        lambda top: print('{} {} bid: {} @ {}\task: {} @ {}'.format(
+            dt.datetime.now(), order_book.product_id, top.bid_size, top.bid, top.ask_size, top.ask)),
+        coalesce_ms=100)
+    order_book.start()
+    try:
+        while True:
+            time.sleep(10)
+    except KeyboardInterrupt:
+        order_book.close()
+
+    if order_book.error:
+        sys.exit(1)
+    else:
+        sys.exit(0)
@@ -0,0 +1,130 @@
+#
+# gdax/mongo_sink.py
+#
+# Batched writes of websocket messages to a Mongo collection from a background thread
+
+from __future__ import print_function
+import time
+from threading import Thread
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+OVERFLOW_POLICIES = ('block', 'drop')
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+class MongoSink(object):
+    """Writes documents to a Mongo collection in batches.
+
+    `insert_one` only queues the document, so it can stand in for the
+    collection given to WebsocketClient as `mongo_collection` without the
+    receive thread waiting on a round trip per message. A background thread
+    writes the queued documents with one `insert_many` per batch of up to
+    `batch_size`, at most `flush_interval` seconds after the first of them
+    was queued.
+
+    At most `max_pending` documents wait to be written. When that many are
+    queued, `overflow` decides whether `insert_one` waits for the writer
+    ('block') or discards the document ('drop'); `blocked` and `dropped`
+    count how often either happened. `failed` counts documents of batches
+    the collection rejected, which are not retried.
+
+    Args:
+        collection (Collection): pymongo collection, or any object with an
+            `insert_many(documents, ordered=False)` method.
+        batch_size (Optional[int]): Most documents written per insert_many.
+        flush_interval (Optional[float]): Most seconds a document waits
+            for its batch to fill up.
+        max_pending (Optional[int]): Most documents queued for writing.
+        overflow (Optional[str]): 'block' or 'drop'.
+
+    """
+
+    def __init__(self, collection, batch_size=1000, flush_interval=1.0, max_pending=100000, overflow='block'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of {}'.format(', '.join(OVERFLOW_POLICIES)))
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.failed = 0
+        self._queue = queue.Queue(max_pending)
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def insert_one(self, document):
+        """Queue `document` for writing."""
+        try:
+            self._queue.put_nowait(document)
+        except queue.Full:
+            if self.overflow == 'drop':
+                self.dropped += 1
+                return
+            self.blocked += 1
+            self._queue.put(document)
+
+    def flush(self):
+        """Block until every queued document has been written."""
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def metrics(self):
+        return {
+            'pending': self._queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'blocked': self.blocked,
+            'failed': self.failed,
+        }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.flush_interval
+            # a flush or close ends the batch early
+            while len(batch) < self.batch_size and batch[-1] is not _FLUSH and batch[-1] is not _CLOSE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+
+            closing = batch[-1] is _CLOSE
+            documents = [document for document in batch if document is not _FLUSH and document is not _CLOSE]
+            if documents:
+                self._write(documents)
+            for _ in batch:
+                self._queue.task_done()
+            if closing:
+                return
+
+    def _write(self, documents):
+        try:
+            self.collection.insert_many(documents, ordered=False)
+        except Exception as e:
+            self.failed += len(documents)
+            print('Error: could not write {} documents to Mongo ({}).'.format(len(documents), e))
+        else:
+            self.written += len(documents)
+            self.batches += 1
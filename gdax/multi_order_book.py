@@ -0,0 +1,91 @@
+#
+# gdax/multi_order_book.py
+#
+# Live order books for several products updated from a single gdax Websocket Feed
+
+from gdax.journal import open_journal
+from gdax.level2_order_book import Level2OrderBook
+from gdax.order_book import OrderBook
+from gdax.public_client import PublicClient
+from gdax.websocket_client import WebsocketClient
+
+
+class MultiOrderBook(WebsocketClient):
+    ''' Tracks one OrderBook per product over a single websocket connection.
+
+    Each message is routed by its product_id to that product's book, which keeps its own sequence and recovers
+    from gaps independently of the others. The books never open sockets of their own.
+
+    With `level=2` the books are Level2OrderBooks fed from the level2 channel instead of the full channel.
+
+    `workers`, `queue_size` and `overflow` are those of WebsocketClient. With several workers, books of different
+    products are updated concurrently, each product always by the same worker.
+
+    `reconnect`, `backoff`, `max_backoff` and `ping_interval` supervise the shared connection as in
+    WebsocketClient, and after a reconnect every book reloads. Other keyword arguments go to every book. '''
+
+    def __init__(self, product_ids=('BTC-USD',), log_to=None, level=3, workers=0, queue_size=10000,
+                 overflow='block', reconnect=False, backoff=1.0, max_backoff=60.0, ping_interval=30.0, **book_kwargs):
+        journal = open_journal(log_to)
+        book_class = Level2OrderBook if level == 2 else OrderBook
+        super(MultiOrderBook, self).__init__(products=list(product_ids), journal=journal, workers=workers,
+                                             queue_size=queue_size, overflow=overflow, reconnect=reconnect,
+                                             backoff=backoff, max_backoff=max_backoff, ping_interval=ping_interval)
+        self._owns_journal = journal is not log_to
+        self._client = PublicClient()
+        self.books = {}
+        for product_id in self.products:
+            book = book_class(product_id=product_id, **book_kwargs)
+            # subscribe to the channels the books are built from
+            self.channels = book.channels
+            book._client = self._client
+            # the books record their snapshots next to the shared feed
+            book.journal = self.journal
+            self.books[product_id] = book
+
+    def get_book(self, product_id):
+        return self.books[product_id]
+
+    def on_open(self):
+        for book in self.books.values():
+            book.stop = False
+            book._sequence = -1
+        print("-- Subscribed to MultiOrderBook! --\n")
+
+    def on_reconnect(self):
+        for book in self.books.values():
+            book.on_reconnect()
+
+    def on_close(self):
+        # the books never run a socket of their own, so stop their snapshot retries along with the shared one
+        for book in self.books.values():
+            book.stop = True
+        print("\n-- MultiOrderBook Socket Closed! --")
+
+    def on_message(self, message):
+        # subscription acknowledgements and errors carry no product_id
+        book = self.books.get(message.get('product_id'))
+        if book is not None:
+            book.on_message(message)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    import datetime as dt
+
+    order_books = MultiOrderBook(product_ids=['BTC-USD', 'LTC-USD', 'ETH-USD', 'BCH-USD'])
+    order_books.start()
+    try:
+        while True:
+            time.sleep(10)
+            for product_id, book in sorted(order_books.books.items()):
+                if book._sequence != -1:
+                    print('{} {} bid: {} ask: {}'.format(dt.datetime.now(), product_id, book.get_bid(), book.get_ask()))
+    except KeyboardInterrupt:
+        order_books.close()
+
+    if order_books.error:
+        sys.exit(1)
+    else:
+        sys.exit(0)
@@ -5,242 +5,769 @@
 # Live order book updated from the gdax Websocket Feed
 
 from sortedcontainers import SortedDict
+from collections import namedtuple
 from decimal import Decimal
-import pickle
+from threading import Lock, Thread
+import binascii
+import time
+import uuid
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from gdax.journal import open_journal
 from gdax.public_client import PublicClient
+from gdax.top_of_book import TopOfBookListener
 from gdax.websocket_client import WebsocketClient
 
 
-class OrderBook(WebsocketClient):
-    def __init__(self, product_id='BTC-USD', log_to=None):
-        super(OrderBook, self).__init__(products=product_id)
+BookSnapshot = namedtuple('BookSnapshot', ['sequence', 'bids', 'asks'])
+BookSnapshot.__doc__ = ''' An immutable view of the aggregated book at `sequence`. `bids` and `asks` are tuples of
+(price, size, num-orders) levels, best first. '''
+
+
+DepthArrays = namedtuple('DepthArrays', ['sequence', 'bid_prices', 'bid_sizes', 'bid_counts',
+                                         'ask_prices', 'ask_sizes', 'ask_counts'])
+DepthArrays.__doc__ = ''' The best levels of the book as contiguous float64 NumPy arrays, best first. '''
+
+
+class _DecimalFormat(object):
+    ''' Stores prices and sizes as Decimal, exactly as they are sent by the exchange. '''
+
+    def price(self, value):
+        return Decimal(value)
+
+    def size(self, value):
+        return Decimal(value)
+
+    def to_price(self, value):
+        return value
+
+    def to_size(self, value):
+        return value
+
+    def price_float(self, value):
+        return float(value)
+
+    def size_float(self, value):
+        return float(value)
+
+    def scale_arrays(self, prices, sizes):
+        pass
+
+
+class _TickFormat(object):
+    ''' Stores prices as integer ticks of the product's quote_increment and sizes as integer base units. '''
+
+    def __init__(self, quote_increment, base_increment='0.00000001'):
+        self.quote_increment = Decimal(quote_increment)
+        self.base_increment = Decimal(base_increment)
+        # Scaling the float parse is exact while the value stays within 2**53 units, far above any real price or size.
+        self._price_scale = float(1 / self.quote_increment)
+        self._size_scale = float(1 / self.base_increment)
+
+    def price(self, value):
+        return int(round(float(value) * self._price_scale))
+
+    def size(self, value):
+        return int(round(float(value) * self._size_scale))
+
+    def to_price(self, value):
+        return value * self.quote_increment
+
+    def to_size(self, value):
+        return value * self.base_increment
+
+    def price_float(self, value):
+        return value / self._price_scale
+
+    def size_float(self, value):
+        return value / self._size_scale
+
+    def scale_arrays(self, prices, sizes):
+        prices /= self._price_scale
+        sizes /= self._size_scale
+
+
+def _compact_id(order_id):
+    ''' Packs a UUID order id into its 16 raw bytes, leaving any other id as it is. '''
+    if len(order_id) == 36:
+        try:
+            return binascii.unhexlify(order_id.replace('-', ''))
+        except (TypeError, ValueError):
+            pass
+    return order_id
+
+
+def _expand_id(order_id):
+    if isinstance(order_id, bytes) and len(order_id) == 16:
+        return str(uuid.UUID(bytes=order_id))
+    return order_id
+
+
+class _Order(object):
+    ''' A resting order, linked into the FIFO queue of its price level. Its side and price are those of the level,
+    so they are not repeated on every order. '''
+
+    __slots__ = ('id', 'size', 'level', 'prev', 'next')
+
+    def __init__(self, order_id, size):
+        self.id = order_id
+        self.size = size
+        self.level = None
+        self.prev = None
+        self.next = None
+
+
+class _PriceLevel(object):
+    ''' The orders resting at a single price, kept in time priority as an intrusive doubly linked list, along with
+    their aggregate size and count. '''
+
+    __slots__ = ('side', 'price', 'head', 'tail', 'size', 'count')
+
+    def __init__(self, side, price):
+        self.side = side
+        self.price = price
+        self.head = None
+        self.tail = None
+        self.size = 0
+        self.count = 0
+
+    def __iter__(self):
+        order = self.head
+        while order is not None:
+            yield order
+            order = order.next
+
+    def append(self, order):
+        order.level = self
+        order.prev = self.tail
+        order.next = None
+        if self.tail is None:
+            self.head = order
+        else:
+            self.tail.next = order
+        self.tail = order
+        self.size += order.size
+        self.count += 1
+
+    def unlink(self, order):
+        if order.prev is None:
+            self.head = order.next
+        else:
+            order.prev.next = order.next
+        if order.next is None:
+            self.tail = order.prev
+        else:
+            order.next.prev = order.prev
+        order.level = order.prev = order.next = None
+        self.size -= order.size
+        self.count -= 1
+
+
+class _BaseOrderBook(WebsocketClient):
+    ''' What the level 3 OrderBook and the Level2OrderBook share: the sorted price trees, the price format, the
+    seqlock that lets readers take consistent views mostly without blocking the feed thread, and the read API built on
+    `_best` and `_level_items`, which each book implements over its own kind of level. '''
+
+    # failed reads of a changing book after which a reader pauses the feed thread, see _read_consistent
+    optimistic_reads = 3
+
+    def __init__(self, product_id, log_to, fixed_point, quote_increment, base_increment, features, channels=None,
+                 **client_kwargs):
+        journal = open_journal(log_to)
+        super(_BaseOrderBook, self).__init__(products=[product_id], channels=channels, journal=journal,
+                                             **client_kwargs)
+        # a journal opened in a directory given as log_to is closed along with the book
+        self._owns_journal = journal is not log_to
         self._asks = SortedDict()
         self._bids = SortedDict()
+        self.features = features
         self._client = PublicClient()
+        self._format = _DecimalFormat()
+        if fixed_point:
+            self._format = None
+            if quote_increment is not None:
+                self._format = _TickFormat(quote_increment, base_increment or '0.00000001')
         self._sequence = -1
-        self._log_to = log_to
-        if self._log_to:
-            assert hasattr(self._log_to, 'write')
+        # odd while the book is being mutated, see _read_consistent
+        self._version = 0
+        # held by a reader that gave up on optimistic reads, the feed thread waits for it before the next change
+        self._reader_lock = Lock()
+        self._reader_waiting = False
+        self._snapshot = None
+        self._depth_buffer = None
         self._current_ticker = None
+        # (sequence, bid, bid size, ask, ask size) in the internal format, kept while there are listeners
+        self._top = None
+        self._top_listeners = []
 
     @property
     def product_id(self):
         ''' Currently OrderBook only supports a single product even though it is stored as a list of products. '''
         return self.products[0]
 
+    def _load_tick_format(self):
+        for product in self._client.get_products():
+            if product['id'] == self.product_id:
+                return _TickFormat(product['quote_increment'], product.get('base_increment', '0.00000001'))
+        raise ValueError('Unknown product {}'.format(self.product_id))
+
+    def _after_reset(self):
+        if self.features is not None:
+            self.features.reset(self)
+        if self._top_listeners:
+            self._update_top()
+
+    def _best(self, side):
+        ''' Returns (price, size) of the best level on the 'buy' or 'sell' side, or None if it is empty. '''
+        raise NotImplementedError
+
+    def _level_items(self, side, n=None):
+        ''' Iterates (price, size, num-orders) of the best `n` levels of a side, best first. '''
+        raise NotImplementedError
+
+    def _read_top(self):
+        bid, bid_size = self._best('buy') or (None, None)
+        ask, ask_size = self._best('sell') or (None, None)
+        return self._sequence, bid, bid_size, ask, ask_size
+
+    def _update_top(self):
+        ''' Records the best bid and ask and wakes the listeners if a price or size changed. '''
+        top = self._read_top()
+        if self._top is None or self._top[1:] != top[1:]:
+            self._top = top
+            for listener in self._top_listeners:
+                listener.notify()
+
+    def add_top_of_book_listener(self, callback, coalesce_ms=None):
+        ''' Calls `callback` with a TopOfBook on a separate thread whenever the best bid or ask price or size
+        changes, at most once every `coalesce_ms` milliseconds if given. Returns the listener to pass to
+        remove_top_of_book_listener. '''
+        listener = TopOfBookListener(self, callback, coalesce_ms)
+        listener.start()
+        if self._sequence != -1:
+            # the top is only tracked while there are listeners, so start from the current book
+            self._top = self._read_consistent(self._read_top)[1]
+        # replaced rather than appended to so the feed thread never iterates a list being changed
+        self._top_listeners = self._top_listeners + [listener]
+        listener.notify()
+        return listener
+
+    def remove_top_of_book_listener(self, listener):
+        self._top_listeners = [l for l in self._top_listeners if l is not listener]
+        if not self._top_listeners:
+            # no longer kept up to date
+            self._top = None
+        listener.stop()
+
+    def get_current_ticker(self):
+        return self._current_ticker
+
+    def _read_consistent(self, read):
+        ''' Runs `read` until it completes without the feed thread mutating the book in the meantime, and returns
+        (version, result). The feed thread does not wait on readers unless a read fails `optimistic_reads` times,
+        as copying a large book can take longer than the gap between messages: the reader then pauses the feed
+        thread before its next change, so the read completes after at most one more update. The feed thread is held
+        up for the rest of that read, which for a full level 3 copy of a busy book can be tens of milliseconds. '''
+        failures = 0
+        while failures < self.optimistic_reads:
+            version = self._version
+            if not version & 1:
+                attempt = self._try_read(read, version)
+                if attempt is not None:
+                    return attempt
+                failures += 1
+            # let the feed thread finish its update
+            time.sleep(0)
+
+        with self._reader_lock:
+            self._reader_waiting = True
+            try:
+                while True:
+                    version = self._version
+                    if not version & 1:
+                        attempt = self._try_read(read, version)
+                        if attempt is not None:
+                            return attempt
+                    time.sleep(0)
+            finally:
+                self._reader_waiting = False
+
+    def _try_read(self, read, version):
+        ''' Returns (version, result) of `read`, or None if the book changed from `version` while it ran. '''
+        try:
+            result = read()
+        except Exception:
+            if self._version == version:
+                raise
+            return None
+        if self._version != version:
+            return None
+        return version, result
+
+    def _wait_for_reader(self):
+        ''' Called by the feed thread before changing the book while a reader has paused it. '''
+        with self._reader_lock:
+            pass
+
+    def get_snapshot(self, depth=None):
+        ''' Returns a BookSnapshot of the best `depth` levels per side (all if None). Snapshots are shared between
+        callers until the book changes, so repeated calls between messages cost nothing. Copying a whole busy book
+        can outlast the gap between messages, in which case the feed thread waits for the copy (see
+        _read_consistent), so readers polling on every tick should pass a `depth`. '''
+        cached = self._snapshot
+        if cached is not None and cached[0] == self._version and cached[1] == depth:
+            return cached[2]
+        version, snapshot = self._read_consistent(lambda: self._build_snapshot(depth))
+        self._snapshot = (version, depth, snapshot)
+        return snapshot
+
+    def _build_snapshot(self, depth):
+        to_price = self._format.to_price
+        to_size = self._format.to_size
+        return BookSnapshot(
+            self._sequence,
+            tuple((to_price(price), to_size(size), count) for price, size, count in self._level_items('buy', depth)),
+            tuple((to_price(price), to_size(size), count) for price, size, count in self._level_items('sell', depth)))
+
+    def get_depth_arrays(self, n):
+        ''' Returns the best `n` levels per side as DepthArrays for vectorized analysis. The arrays are views of
+        buffers owned by the book and are overwritten by the next call, so copy them to keep them around. '''
+        if np is None:
+            raise ImportError('get_depth_arrays requires numpy')
+        if self._depth_buffer is None or self._depth_buffer.shape[2] != n:
+            # [side][price, size, count][level]
+            self._depth_buffer = np.empty((2, 3, n))
+        return self._read_consistent(lambda: self._fill_depth_arrays(n))[1]
+
+    def _fill_depth_arrays(self, n):
+        columns = []
+        for side, rows in zip(('buy', 'sell'), self._depth_buffer):
+            levels = list(self._level_items(side, n))
+            k = len(levels)
+            prices, sizes, counts = rows[0, :k], rows[1, :k], rows[2, :k]
+            if k:
+                # a count of None, where the book does not know it, is stored as NaN
+                prices[:], sizes[:], counts[:] = zip(*levels)
+            self._format.scale_arrays(prices, sizes)
+            columns.extend((prices, sizes, counts))
+        return DepthArrays(self._sequence, *columns)
+
+    def get_depth(self, side, n=None):
+        ''' Returns the best `n` levels (all if None) on the 'buy' or 'sell' side as [price, size, num-orders],
+        in the same shape as a level 2 `get_product_order_book`. '''
+        return self._read_consistent(lambda: self._build_depth(side, n))[1]
+
+    def _build_depth(self, side, n):
+        to_price = self._format.to_price
+        to_size = self._format.to_size
+        return [[to_price(price), to_size(size), count] for price, size, count in self._level_items(side, n)]
+
+    def get_ask(self):
+        return self._format.to_price(self._read_consistent(lambda: self._asks.peekitem(0)[0])[1])
+
+    def get_bid(self):
+        return self._format.to_price(self._read_consistent(lambda: self._bids.peekitem(-1)[0])[1])
+
+
+class OrderBook(_BaseOrderBook):
+    # most messages kept while a snapshot downloads, past which they are dropped and the book resyncs again
+    max_resync_buffer = 100000
+
+    def __init__(self, product_id='BTC-USD', log_to=None, fixed_point=False, quote_increment=None,
+                 base_increment=None, compact_ids=False, features=None, **client_kwargs):
+        ''' `log_to` is a JournalWriter, or a directory to open one in, that records every raw feed frame.
+
+        With `fixed_point` the book keys prices by integer ticks and sizes by integer base units, converting
+        back to Decimal only in the public getters. The increments are looked up with `get_products` on the first
+        reset unless given.
+
+        With `compact_ids` UUID order ids are held as 16 raw bytes instead of 36 character strings, and only
+        formatted back to strings by get_current_book and get_bids/get_asks.
+
+        `features` is a BookFeatures tracker kept up to date as the book changes.
+
+        Other keyword arguments, such as `workers` to apply messages off the receive thread, go to WebsocketClient. '''
+        super(OrderBook, self).__init__(product_id, log_to, fixed_point, quote_increment, base_increment, features,
+                                        **client_kwargs)
+        self._orders = {}
+        self._compact_ids = compact_ids
+        self._resyncing = False
+        self._resync_lock = Lock()
+        self._resync_buffer = []
+        self._resync_thread = None
+        self._resync_requested = False
+        # while a BookVerifier checks the book, the list of (sequence, side, price, size, num-orders) of every level
+        # a message is about to change, so the book can be rewound to the sequence of a REST snapshot
+        self._change_log = None
+        # message type -> method applying it, replacing a chain of type comparisons per message
+        self._appliers = {'open': self.add, 'done': self._apply_done, 'match': self._apply_match,
+                          'change': self.change}
+
     def on_open(self):
         self._sequence = -1
         print("-- Subscribed to OrderBook! --\n")
 
+    def on_reconnect(self):
+        # messages were lost while disconnected, reload the book rather than wait for the gap to show
+        self.request_resync()
+
     def on_close(self):
         print("\n-- OrderBook Socket Closed! --")
 
     def reset_book(self):
-        self._asks = SortedDict()
-        self._bids = SortedDict()
-        res = self._client.get_product_order_book(product_id=self.product_id, level=3)
-        for bid in res['bids']:
-            self.add({
-                'id': bid[2],
-                'side': 'buy',
-                'price': Decimal(bid[0]),
-                'size': Decimal(bid[1])
-            })
-        for ask in res['asks']:
-            self.add({
-                'id': ask[2],
-                'side': 'sell',
-                'price': Decimal(ask[0]),
-                'size': Decimal(ask[1])
-            })
-        self._sequence = res['sequence']
+        stream = getattr(self._client, 'stream_product_order_book', None)
+        if stream is None:
+            # stand-ins for PublicClient, such as a replay's, serve whole snapshots
+            res = self._client.get_product_order_book(product_id=self.product_id, level=3)
+            if self.journal is not None:
+                self.journal.write_snapshot(self.product_id, res)
+            self.load_snapshot(res)
+            return
 
-    def on_message(self, message):
-        if self._log_to:
-            pickle.dump(message, self._log_to)
+        recorder = self.journal.record_snapshot(self.product_id) if self.journal is not None else None
+        try:
+            self.load_snapshot_stream(stream(self.product_id, level=3, tee=recorder))
+        except Exception:
+            if recorder is not None:
+                recorder.abort()
+            raise
+        if recorder is not None:
+            recorder.commit(self._sequence)
+
+    def load_snapshot(self, res):
+        ''' Replaces the book with a level 3 `get_product_order_book` snapshot. '''
+        self.load_snapshot_stream([('sequence', res['sequence']), ('bids', res['bids']), ('asks', res['asks'])])
+
+    def load_snapshot_stream(self, items):
+        ''' Replaces the book with a level 3 snapshot given as the (key, value) items of
+        PublicClient.stream_product_order_book, such as ('bids', rows). The new levels are built aside as the rows
+        arrive, so the old book stays readable until it is swapped out at once. '''
+        if self._format is None:
+            self._format = self._load_tick_format()
+        price_of = self._format.price
+        size_of = self._format.size
+        compact_ids = self._compact_ids
+        sides = {'bids': ('buy', {}), 'asks': ('sell', {})}
+        orders = {}
+        sequence = None
+        for key, rows in items:
+            if key not in sides:
+                if key == 'sequence':
+                    sequence = rows
+                continue
+            side, levels = sides[key]
+            for row in rows:
+                price = price_of(row[0])
+                level = levels.get(price)
+                if level is None:
+                    level = levels[price] = _PriceLevel(side, price)
+                order_id = _compact_id(row[2]) if compact_ids else row[2]
+                order = _Order(order_id, size_of(row[1]))
+                level.append(order)
+                orders[order_id] = order
+        if sequence is None:
+            raise ValueError('Order book snapshot without a sequence')
+        bids = SortedDict(sides['bids'][1])
+        asks = SortedDict(sides['asks'][1])
+
+        if self._reader_waiting:
+            self._wait_for_reader()
+        self._version += 1
+        try:
+            self._bids = bids
+            self._asks = asks
+            self._orders = orders
+            self._sequence = sequence
+            # a verification in progress cannot rewind past a snapshot
+            self._change_log = None
+        finally:
+            self._version += 1
+        self._after_reset()
 
-        sequence = message['sequence']
-        if self._sequence == -1:
-            self.reset_book()
+    def on_message(self, message):
+        if self._resyncing:
+            with self._resync_lock:
+                if self._resyncing:
+                    # the snapshot is still downloading, keep the message to replay on top of it
+                    if len(self._resync_buffer) >= self.max_resync_buffer:
+                        # the messages dropped leave a gap after the snapshot, which starts another resync
+                        print('Error: {} messages buffered during resync. Dropping them.'.format(
+                            len(self._resync_buffer)))
+                        self._resync_buffer = []
+                    self._resync_buffer.append(message)
+                    return
+
+        if self._sequence == -1 or self._resync_requested:
+            self._resync_requested = False
+            self._start_resync([message])
             return
+        try:
+            applied = self._process(message)
+        except Exception as e:
+            # a message that does not fit the book, such as a match of an order not at the head of its level, means
+            # it has diverged and may be half updated
+            print('Error: could not apply message {} ({}). Re-initializing book.'.format(message.get('sequence'), e))
+            applied = False
+        if not applied:
+            self._start_resync([message])
+
+    def request_resync(self):
+        ''' Reloads the book from a level 3 snapshot, started by the feed thread on the next message. '''
+        self._resync_requested = True
+
+    def _process(self, message):
+        ''' Applies one feed message to the book. Returns False, leaving the book untouched, on a sequence gap. '''
+        sequence = message['sequence']
         if sequence <= self._sequence:
             # ignore older messages (e.g. before order book initialization from getProductOrderBook)
-            return
+            return True
         elif sequence > self._sequence + 1:
             self.on_sequence_gap(self._sequence, sequence)
-            return
+            return False
 
-        msg_type = message['type']
-        if msg_type == 'open':
-            self.add(message)
-        elif msg_type == 'done' and 'price' in message:
+        if self._reader_waiting:
+            self._wait_for_reader()
+        self._version += 1
+        try:
+            # read once the version is odd, so that a verifier attaching a log cannot miss this message
+            change_log = self._change_log
+            if change_log is not None and 'price' in message:
+                self._log_change(change_log, sequence, message)
+            apply = self._appliers.get(message['type'])
+            if apply is not None:
+                apply(message)
+            self._sequence = sequence
+        finally:
+            self._version += 1
+        if self.features is not None:
+            self.features.update(self, message)
+        if self._top_listeners:
+            self._update_top()
+        return True
+
+    def _apply_done(self, message):
+        # market orders never rest on the book and have no price
+        if 'price' in message:
             self.remove(message)
-        elif msg_type == 'match':
-            self.match(message)
-            self._current_ticker = message
-        elif msg_type == 'change':
-            self.change(message)
 
-        self._sequence = sequence
+    def _apply_match(self, message):
+        self.match(message)
+        self._current_ticker = message
 
-    def on_sequence_gap(self, gap_start, gap_end):
-        self.reset_book()
-        print('Error: messages missing ({} - {}). Re-initializing  book at sequence.'.format(
-            gap_start, gap_end, self._sequence))
+    def _log_change(self, change_log, sequence, message):
+        side = message['side']
+        price = self._format.price(message['price'])
+        level = self._tree(side).get(price)
+        if level is None:
+            change_log.append((sequence, side, price, 0, 0))
+        else:
+            change_log.append((sequence, side, price, level.size, level.count))
+
+    def _start_resync(self, buffered):
+        ''' Downloads a fresh snapshot on a background thread while the feed keeps buffering messages. '''
+        self._resync_buffer = buffered
+        self._resyncing = True
+        self._resync_thread = Thread(target=self._resync)
+        self._resync_thread.daemon = True
+        self._resync_thread.start()
+
+    def _resync(self):
+        while True:
+            try:
+                self.reset_book()
+                break
+            except Exception as e:
+                if self.stop:
+                    with self._resync_lock:
+                        self._resync_buffer = []
+                        self._resyncing = False
+                    return
+                print('Error: could not load the order book snapshot ({}). Retrying.'.format(e))
+                time.sleep(1)
+
+        with self._resync_lock:
+            buffered = self._resync_buffer
+            self._resync_buffer = []
+            i = 0
+            try:
+                for i, message in enumerate(buffered):
+                    if not self._process(message):
+                        self._start_resync(buffered[i:])
+                        return
+            except Exception as e:
+                # the book may be half updated, so reload it rather than leave it stale behind the buffer
+                print('Error: could not apply message {} ({}). Re-initializing book.'.format(
+                    buffered[i].get('sequence'), e))
+                self._start_resync(buffered[i + 1:])
+                return
+            self._resyncing = False
 
+    def on_sequence_gap(self, gap_start, gap_end):
+        print('Error: messages missing ({} - {}). Re-initializing book.'.format(gap_start, gap_end))
+
+    def _tree(self, side):
+        return self._bids if side == 'buy' else self._asks
+
+    def _insert(self, order_id, side, price, size):
+        tree = self._bids if side == 'buy' else self._asks
+        level = tree.get(price)
+        if level is None:
+            level = tree[price] = _PriceLevel(side, price)
+        order = _Order(order_id, size)
+        level.append(order)
+        self._orders[order_id] = order
+
+    def _discard(self, order):
+        level = order.level
+        level.unlink(order)
+        del self._orders[order.id]
+        if level.head is None:
+            del self._tree(level.side)[level.price]
+
+    def _resting(self, order_id):
+        if self._compact_ids:
+            order_id = _compact_id(order_id)
+        return self._orders.get(order_id)
 
     def add(self, order):
-        order = {
-            'id': order.get('order_id') or order['id'],
-            'side': order['side'],
-            'price': Decimal(order['price']),
-            'size': Decimal(order.get('size') or order['remaining_size'])
-        }
-        if order['side'] == 'buy':
-            bids = self.get_bids(order['price'])
-            if bids is None:
-                bids = [order]
-            else:
-                bids.append(order)
-            self.set_bids(order['price'], bids)
-        else:
-            asks = self.get_asks(order['price'])
-            if asks is None:
-                asks = [order]
-            else:
-                asks.append(order)
-            self.set_asks(order['price'], asks)
+        order_id = order.get('order_id') or order['id']
+        if self._compact_ids:
+            order_id = _compact_id(order_id)
+        self._insert(order_id,
+                     order['side'],
+                     self._format.price(order['price']),
+                     self._format.size(order.get('size') or order['remaining_size']))
 
     def remove(self, order):
-        price = Decimal(order['price'])
-        if order['side'] == 'buy':
-            bids = self.get_bids(price)
-            if bids is not None:
-                bids = [o for o in bids if o['id'] != order['order_id']]
-                if len(bids) > 0:
-                    self.set_bids(price, bids)
-                else:
-                    self.remove_bids(price)
-        else:
-            asks = self.get_asks(price)
-            if asks is not None:
-                asks = [o for o in asks if o['id'] != order['order_id']]
-                if len(asks) > 0:
-                    self.set_asks(price, asks)
-                else:
-                    self.remove_asks(price)
+        resting = self._resting(order['order_id'])
+        if resting is not None:
+            self._discard(resting)
 
     def match(self, order):
-        size = Decimal(order['size'])
-        price = Decimal(order['price'])
-
-        if order['side'] == 'buy':
-            bids = self.get_bids(price)
-            if not bids:
-                return
-            assert bids[0]['id'] == order['maker_order_id']
-            if bids[0]['size'] == size:
-                self.set_bids(price, bids[1:])
-            else:
-                bids[0]['size'] -= size
-                self.set_bids(price, bids)
+        resting = self._resting(order['maker_order_id'])
+        if resting is None:
+            return
+        assert resting.level.head is resting
+        size = self._format.size(order['size'])
+        if resting.size == size:
+            self._discard(resting)
         else:
-            asks = self.get_asks(price)
-            if not asks:
-                return
-            assert asks[0]['id'] == order['maker_order_id']
-            if asks[0]['size'] == size:
-                self.set_asks(price, asks[1:])
-            else:
-                asks[0]['size'] -= size
-                self.set_asks(price, asks)
+            resting.size -= size
+            resting.level.size -= size
 
     def change(self, order):
         try:
-            new_size = Decimal(order['new_size'])
+            new_size = self._format.size(order['new_size'])
         except KeyError:
             return
 
-        try:
-            price = Decimal(order['price'])
-        except KeyError:
-            return
-
-        if order['side'] == 'buy':
-            bids = self.get_bids(price)
-            if bids is None or not any(o['id'] == order['order_id'] for o in bids):
-                return
-            index = [b['id'] for b in bids].index(order['order_id'])
-            bids[index]['size'] = new_size
-            self.set_bids(price, bids)
-        else:
-            asks = self.get_asks(price)
-            if asks is None or not any(o['id'] == order['order_id'] for o in asks):
-                return
-            index = [a['id'] for a in asks].index(order['order_id'])
-            asks[index]['size'] = new_size
-            self.set_asks(price, asks)
-
-        tree = self._asks if order['side'] == 'sell' else self._bids
-        node = tree.get(price)
-
-        if node is None or not any(o['id'] == order['order_id'] for o in node):
-            return
-
-    def get_current_ticker(self):
-        return self._current_ticker
-
-    def get_current_book(self):
-        result = {
+        resting = self._resting(order['order_id'])
+        if resting is not None:
+            resting.level.size += new_size - resting.size
+            resting.size = new_size
+
+    def get_current_book(self, depth=None):
+        ''' Returns every resting order as [price, size, order-id] with bids and asks in ascending price order,
+        limited to the best `depth` levels per side if given. Without a `depth`, a copy of a busy book can stall the
+        feed thread for as long as it takes, so frequent readers should use get_snapshot(depth) instead. '''
+        return self._read_consistent(lambda: self._build_current_book(depth))[1]
+
+    def _build_current_book(self, depth):
+        to_price = self._format.to_price
+        to_size = self._format.to_size
+        bids = self._bids.values()
+        asks = self._asks.values()
+        if depth is not None:
+            bids = bids[-depth:]
+            asks = asks[:depth]
+        return {
             'sequence': self._sequence,
-            'asks': [],
-            'bids': [],
+            'asks': [[to_price(level.price), to_size(o.size), _expand_id(o.id)] for level in asks for o in level],
+            'bids': [[to_price(level.price), to_size(o.size), _expand_id(o.id)] for level in bids for o in level],
         }
-        for ask in self._asks:
-            try:
-                # There can be a race condition here, where a price point is removed
-                # between these two ops
-                this_ask = self._asks[ask]
-            except KeyError:
-                continue
-            for order in this_ask:
-                result['asks'].append([order['price'], order['size'], order['id']])
-        for bid in self._bids:
-            try:
-                # There can be a race condition here, where a price point is removed
-                # between these two ops
-                this_bid = self._bids[bid]
-            except KeyError:
-                continue
-
-            for order in this_bid:
-                result['bids'].append([order['price'], order['size'], order['id']])
-        return result
 
-    def get_ask(self):
-        return self._asks.peekitem(0)[0]
+    def get_level(self, price):
+        ''' Returns [size, num-orders] aggregated at `price`, or None if no orders rest there. '''
+        key = self._format.price(str(price))
+        found = self._read_consistent(lambda: self._find_level(key))[1]
+        if found is None:
+            return None
+        return [self._format.to_size(found[0]), found[1]]
+
+    def _find_level(self, key):
+        level = self._bids.get(key) or self._asks.get(key)
+        if level is None:
+            return None
+        return level.size, level.count
+
+    def _levels(self, side, n=None):
+        ''' Iterates the best `n` price levels of a side, best first. '''
+        if side == 'buy':
+            levels = self._bids.values()
+            return reversed(levels if n is None else levels[-n:])
+        levels = self._asks.values()
+        return levels if n is None else levels[:n]
+
+    def _level_items(self, side, n=None):
+        return ((level.price, level.size, level.count) for level in self._levels(side, n))
+
+    def _best(self, side):
+        if side == 'buy':
+            if not self._bids:
+                return None
+            level = self._bids.peekitem(-1)[1]
+        else:
+            if not self._asks:
+                return None
+            level = self._asks.peekitem(0)[1]
+        return level.price, level.size
+
+    def _get_orders(self, side, price):
+        key = self._format.price(str(price))
+        return self._read_consistent(lambda: self._build_orders(side, key))[1]
+
+    def _build_orders(self, side, key):
+        level = self._tree(side).get(key)
+        if level is None:
+            return None
+        price = self._format.to_price(level.price)
+        return [{'id': _expand_id(o.id), 'side': level.side, 'price': price, 'size': self._format.to_size(o.size)}
+                for o in level]
+
+    def _set_orders(self, side, price, orders):
+        self._remove_level(self._tree(side), price)
+        price = self._format.price(str(price))
+        for order in orders:
+            order_id = _compact_id(order['id']) if self._compact_ids else order['id']
+            self._insert(order_id, side, price, self._format.size(str(order['size'])))
+
+    def _remove_level(self, tree, price):
+        level = tree.pop(self._format.price(str(price)), None)
+        if level is not None:
+            for order in level:
+                del self._orders[order.id]
 
     def get_asks(self, price):
-        return self._asks.get(price)
+        return self._get_orders('sell', price)
 
     def remove_asks(self, price):
-        del self._asks[price]
+        self._remove_level(self._asks, price)
 
     def set_asks(self, price, asks):
-        self._asks[price] = asks
-
-    def get_bid(self):
-        return self._bids.peekitem(-1)[0]
+        self._set_orders('sell', price, asks)
 
     def get_bids(self, price):
-        return self._bids.get(price)
+        return self._get_orders('buy', price)
 
     def remove_bids(self, price):
-        del self._bids[price]
+        self._remove_level(self._bids, price)
 
     def set_bids(self, price, bids):
-        self._bids[price] = bids
+        self._set_orders('buy', price, bids)
 
 
 if __name__ == '__main__':
@@ -252,37 +779,17 @@ if __name__ == '__main__':
     class OrderBookConsole(OrderBook):
         ''' Logs real-time changes to the bid-ask spread to the console '''
 
-        def __init__(self, product_id=None):
+        def __init__(self, product_id='BTC-USD'):
             super(OrderBookConsole, self).__init__(product_id=product_id)
 
-            # latest values of bid-ask spread
-            self._bid = None
-            self._ask = None
-            self._bid_depth = None
-            self._ask_depth = None
-
-        def on_message(self, message):
-            super(OrderBookConsole, self).on_message(message)
-
-            # Calculate newest bid-ask spread
-            bid = self.get_bid()
-            bids = self.get_bids(bid)
-            bid_depth = sum([b['size'] for b in bids])
-            ask = self.get_ask()
-            asks = self.get_asks(ask)
-            ask_depth = sum([a['size'] for a in asks])
-
-            if self._bid == bid and self._ask == ask and self._bid_depth == bid_depth and self._ask_depth == ask_depth:
-                # If there are no changes to the bid-ask spread since the last update, no need to print
-                pass
-            else:
-                # If there are differences, update the cache
-                self._bid = bid
-                self._ask = ask
-                self._bid_depth = bid_depth
-                self._ask_depth = ask_depth
-                print('{} {} bid: {:.3f} @ {:.2f}\task: {:.3f} @ {:.2f}'.format(
-                    dt.datetime.now(), self.product_id, bid_depth, bid, ask_depth, ask))
+            # called off the feed thread only when the best bid or ask changes, at most every 100ms
+            self.add_top_of_book_listener(self.on_top_of_book, coalesce_ms=100)
+
+        def on_top_of_book(self, top):
+            if top.bid is None or top.ask is None:
+                return
+            print('{} {} bid: {:.3f} @ {:.2f}\task: {:.3f} @ {:.2f}'.format(
+                dt.datetime.now(), self.product_id, top.bid_size, top.bid, top.ask_size, top.ask))
 
     order_book = OrderBookConsole()
     order_book.start()
@@ -0,0 +1,112 @@
+#
+# gdax/order_book_stream.py
+#
+# Incremental parsing of get_product_order_book responses as they download
+
+import codecs
+import json
+import numbers
+import re
+
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+# a run of complete rows of scalars, such as ["price", "size", "order-id"], separated by commas
+_ROWS = re.compile(r'\[[^\[\]]*\](?:\s*,\s*\[[^\[\]]*\])*')
+
+
+class _Reader(object):
+    ''' A cursor over JSON text arriving in chunks of bytes. Consumed text is dropped whenever a chunk is read. '''
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder('utf-8')().decode
+        self._buf = ''
+        self._pos = 0
+
+    def _fill(self):
+        ''' Appends the next chunk to the buffer, returning False at the end of the body. '''
+        for chunk in self._chunks:
+            text = self._decode(chunk)
+            if text:
+                self._buf = self._buf[self._pos:] + text
+                self._pos = 0
+                return True
+        return False
+
+    def peek(self):
+        while True:
+            buf = self._buf
+            pos = self._pos
+            end = len(buf)
+            while pos < end and buf[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < end:
+                return buf[pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of order book')
+
+    def expect(self, chars):
+        c = self.peek()
+        if c not in chars:
+            raise ValueError('Expected {!r} but found {!r} in order book'.format(chars, c))
+        self._pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                # the value continues in the next chunk
+                if not self._fill():
+                    raise
+                continue
+            # a number that ends the buffer may have more digits in the next chunk
+            if end == len(self._buf) and isinstance(value, numbers.Number) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def rows(self):
+        ''' Decodes every complete row at the cursor with a single json.loads, which is several times faster than
+        decoding them one by one. Returns [] if the next row is incomplete or not a flat list of scalars. '''
+        self.peek()
+        match = _ROWS.match(self._buf, self._pos)
+        if match is None:
+            return []
+        try:
+            rows = json.loads('[' + match.group() + ']')
+        except ValueError:
+            # a bracket inside a string cut a row short
+            return []
+        self._pos = match.end()
+        return rows
+
+
+def iter_order_book(chunks):
+    ''' Parses a `get_product_order_book` JSON body from an iterable of byte `chunks`, yielding ('bids', rows) and
+    ('asks', rows) with lists of the rows completed by each chunk, and (key, value) for any other member such as
+    'sequence'. Only the current chunk and its rows are held in memory, never the whole document. '''
+    reader = _Reader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key in ('bids', 'asks') and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.expect(']')
+            else:
+                while True:
+                    yield key, reader.rows() or [reader.value()]
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            yield key, reader.value()
+        if reader.expect(',}') == '}':
+            return
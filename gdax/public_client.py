@@ -4,7 +4,59 @@
 #
 # For public requests to the GDAX exchange
 
+import os
+from threading import Lock
+
 import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+from gdax.order_book_stream import iter_order_book
+from gdax.rate_limiter import retry_after, shared_rate_limiter
+
+
+_shared_session = None
+_shared_session_pid = None
+_shared_session_lock = Lock()
+
+
+def _tee(chunks, f):
+    for chunk in chunks:
+        f.write(chunk)
+        yield chunk
+
+
+def make_session(pool_size=10, retries=3, backoff_factor=0.3):
+    """Create a requests Session that keeps connections alive between requests.
+
+    Args:
+        pool_size (Optional[int]): Connections kept open per host, the
+            most requests that can run concurrently without opening more.
+        retries (Optional[int]): Retries of a request that could not
+            connect, or of an idempotent request that failed or got a 5xx
+            response. An order that was sent is never retried.
+        backoff_factor (Optional[float]): Retries wait backoff_factor
+            seconds, doubling each time.
+
+    """
+    retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(500, 502, 503, 504),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def shared_session():
+    """Returns the session used by clients created without one. Each process gets its own, since pooled
+    connections must not be shared across a fork."""
+    global _shared_session, _shared_session_pid
+    with _shared_session_lock:
+        if _shared_session is None or _shared_session_pid != os.getpid():
+            _shared_session = make_session()
+            _shared_session_pid = os.getpid()
+        return _shared_session
 
 
 class PublicClient(object):
@@ -15,23 +67,54 @@ class PublicClient(object):
 
     Attributes:
         url (Optional[str]): API URL. Defaults to GDAX API.
+        max_throttled_retries (int): Times a request the exchange answers
+            with 429 Too Many Requests is sent again.
 
     """
 
-    def __init__(self, api_url='https://api.gdax.com', timeout=30):
+    max_throttled_retries = 5
+
+    def __init__(self, api_url='https://api.gdax.com', timeout=30, session=None, rate_limiter=None):
         """Create GDAX API public client.
 
         Args:
             api_url (Optional[str]): API URL. Defaults to GDAX API.
+            timeout (Optional[float]): Seconds to wait for a response.
+            session (Optional[Session]): Session whose connections the
+                client reuses, see `make_session`. Defaults to one shared
+                by every client of the process.
+            rate_limiter (Optional[RateLimiter]): Paces the requests,
+                authenticated ones with its private bucket. Defaults to one
+                shared by every client of the process.
 
         """
         self.url = api_url.rstrip('/')
         self.timeout = timeout
+        self.session = session
+        self.rate_limiter = rate_limiter
+
+    def _send(self, method, url, **kwargs):
+        """Perform a request over a pooled keep-alive connection, once the rate limiter allows it. The exchange
+        processes none of a request it throttles, so after a 429 the request waits as long as the response's
+        Retry-After asks, pausing every client sharing the limiter, and is sent again."""
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.session if self.session is not None else shared_session()
+        limiter = self.rate_limiter if self.rate_limiter is not None else shared_rate_limiter()
+        bucket = limiter.bucket('auth' in kwargs)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            r = session.request(method, url, **kwargs)
+            if r.status_code != 429 or attempt >= self.max_throttled_retries:
+                return r
+            r.close()
+            bucket.pause(retry_after(r.headers.get('Retry-After'), attempt))
+            attempt += 1
 
     def _get(self, path, params=None):
         """Perform get request"""
 
-        r = requests.get(self.url + path, params=params, timeout=self.timeout)
+        r = self._send('get', self.url + path, params=params)
         # r.raise_for_status()
         return r.json()
 
@@ -95,6 +178,39 @@ class PublicClient(object):
         level = level if level in range(1, 4) else 1
         return self._get('/products/{}/book'.format(str(product_id)), params={'level': level})
 
+    def stream_product_order_book(self, product_id, level=3, tee=None, chunk_size=65536):
+        """Get the order book of a product like `get_product_order_book`,
+        parsing the response while it downloads.
+
+        Meant for the multi-megabyte level 3 book, which never has to be
+        held in memory as a whole.
+
+        Args:
+            product_id (str): Product
+            level (Optional[int]): Order book level (1, 2, or 3).
+                Default is 3.
+            tee (Optional[file]): Binary file that also receives the raw
+                response body, such as a journal's snapshot recorder.
+            chunk_size (Optional[int]): Bytes read from the socket at once.
+
+        Yields:
+            tuple: ('sequence', int), then ('bids', rows) and
+                ('asks', rows) with lists of consecutive rows, as in
+                `get_product_order_book`, as soon as they are downloaded.
+
+        """
+        level = level if level in range(1, 4) else 1
+        r = self._send('get', self.url + '/products/{}/book'.format(str(product_id)), params={'level': level},
+                       stream=True)
+        try:
+            chunks = r.iter_content(chunk_size)
+            if tee is not None:
+                chunks = _tee(chunks, tee)
+            for item in iter_order_book(chunks):
+                yield item
+        finally:
+            r.close()
+
     def get_product_ticker(self, product_id):
         """Snapshot about the last trade (tick), best bid/ask and 24h volume.
 
@@ -156,7 +272,7 @@ class PublicClient(object):
             # we only add it if the limit is less than 100
             params['limit'] = limit
 
-        r = requests.get(url, params=params)
+        r = self._send('get', url, params=params)
         # r.raise_for_status()
 
         result.extend(r.json())
@@ -167,8 +283,7 @@ class PublicClient(object):
             if limit <= 0:
                 return result
 
-            # TODO: need a way to ensure that we don't get rate-limited/blocked
-            # time.sleep(0.4)
+            # the pages are paced by the rate limiter in _send
             return self.get_product_trades(product_id=product_id, after=r.headers['cb-after'], limit=limit, result=result)
 
         return result
@@ -0,0 +1,122 @@
+#
+# gdax/rate_limiter.py
+#
+# Token buckets pacing REST requests below the exchange's rate limits
+
+from email.utils import mktime_tz, parsedate_tz
+import os
+import time
+from threading import Lock
+
+from gdax.stats import LatencyHistogram
+
+
+_shared = None
+_shared_pid = None
+_shared_lock = Lock()
+
+
+class TokenBucket(object):
+    """Allows `rate` requests per second on average and up to `burst` at once.
+
+    `acquire` never fails: a caller finding the bucket empty reserves the
+    next token and sleeps until it is due, so concurrent callers are served
+    in order at the sustained rate. `pause` stops handing out tokens for a
+    while, as a 429 response's Retry-After asks. `clock` and `sleep`
+    default to time.time and time.sleep.
+
+    """
+
+    def __init__(self, rate, burst, clock=time.time, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self.requests = 0
+        self.throttled = 0
+        # seconds each acquire waited for its token
+        self.waits = LatencyHistogram()
+        self._tokens = float(burst)
+        # when _tokens was last brought up to date, in the future while paused
+        self._updated = clock()
+        self._lock = Lock()
+
+    def acquire(self):
+        """Take a token, waiting for one if needed. Returns the seconds waited."""
+        with self._lock:
+            now = self._clock()
+            if now > self._updated:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            # a negative balance is the queue of callers already waiting for their tokens
+            self._tokens -= 1
+            wait = self._updated - now
+            if self._tokens < 0:
+                wait -= self._tokens / self.rate
+            self.requests += 1
+            self.waits.record(wait)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Hand out no tokens for `seconds`, after which the bucket refills from empty."""
+        with self._lock:
+            self.throttled += 1
+            resume = self._clock() + seconds
+            if resume > self._updated:
+                self._updated = resume
+                self._tokens = min(self._tokens, 0)
+
+    def metrics(self):
+        return {'requests': self.requests, 'throttled': self.throttled, 'wait': self.waits.summary()}
+
+
+class RateLimiter(object):
+    """Separate token buckets for the public and private REST endpoints.
+
+    The exchange limits public requests by IP address and private ones by
+    API key, so the defaults follow its documented limits of 3 public
+    requests per second in bursts of up to 6, and 5 private ones in bursts
+    of up to 10.
+
+    Args:
+        public_rate (Optional[float]): Public requests per second.
+        public_burst (Optional[int]): Public requests sent at once.
+        private_rate (Optional[float]): Private requests per second.
+        private_burst (Optional[int]): Private requests sent at once.
+
+    """
+
+    def __init__(self, public_rate=3, public_burst=6, private_rate=5, private_burst=10):
+        self.public = TokenBucket(public_rate, public_burst)
+        self.private = TokenBucket(private_rate, private_burst)
+
+    def bucket(self, private):
+        return self.private if private else self.public
+
+    def metrics(self):
+        return {'public': self.public.metrics(), 'private': self.private.metrics()}
+
+
+def retry_after(value, attempt=0):
+    """Returns the seconds a 429 response's Retry-After header `value` asks to wait, given either as seconds or
+    as an HTTP date. Without a usable header, waits 1 second doubling with every `attempt`."""
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            date = parsedate_tz(value)
+            if date is not None:
+                return max(0.0, mktime_tz(date) - time.time())
+    return float(2 ** min(attempt, 6))
+
+
+def shared_rate_limiter():
+    """Returns the RateLimiter used by clients created without one, shared by every client of the process."""
+    global _shared, _shared_pid
+    with _shared_lock:
+        if _shared is None or _shared_pid != os.getpid():
+            _shared = RateLimiter()
+            _shared_pid = os.getpid()
+        return _shared
@@ -0,0 +1,127 @@
+#
+# gdax/receive_queue.py
+#
+# Bounded queues handing raw websocket frames from the receive thread to worker threads
+
+from collections import deque
+from threading import Condition, Lock
+import re
+import time
+
+from gdax.stats import LatencyHistogram
+
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'coalesce')
+
+_PRODUCT_ID = re.compile(r'"product_id"\s*:\s*"([^"]*)"')
+_TYPE = re.compile(r'"type"\s*:\s*"([^"]*)"')
+
+
+def frame_product(frame):
+    ''' Returns the product_id of a raw JSON frame without decoding it, or None if it has none. '''
+    if isinstance(frame, bytes):
+        frame = frame.decode('utf-8')
+    match = _PRODUCT_ID.search(frame)
+    return match.group(1) if match is not None else None
+
+
+def frame_type(frame):
+    ''' Returns the type of a raw JSON frame without decoding it, or None if it has none. The feed sends the type
+    first, so the search stops within the first few characters. '''
+    if isinstance(frame, bytes):
+        frame = frame.decode('utf-8')
+    match = _TYPE.search(frame)
+    return match.group(1) if match is not None else None
+
+
+class ReceiveQueue(object):
+    """Bounded FIFO of raw frames with their local receive times.
+
+    When `maxsize` frames are waiting, `put` applies the `overflow` policy:
+
+    * 'block': wait for a worker to make room, pushing back on the socket.
+    * 'drop_oldest': discard the oldest waiting frame.
+    * 'coalesce': overwrite the waiting frame of the same product with the
+      new one, keeping its place in the queue, or drop the oldest frame if
+      none is waiting. Suits feeds where only the latest message of a
+      product matters, such as the ticker channel; an OrderBook that loses
+      messages this way resyncs on the sequence gap.
+
+    Besides the current `depth`, the queue keeps the `max_depth` reached,
+    the number of frames `dropped` and `coalesced`, and a histogram of the
+    `lag` in seconds between receiving a frame and a worker taking it.
+
+    """
+
+    def __init__(self, maxsize=10000, overflow='block'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of {}'.format(', '.join(OVERFLOW_POLICIES)))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.max_depth = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.lag = LatencyHistogram()
+        # [frame, receive time, product] lists, so that a coalesced frame can be replaced in place
+        self._items = deque()
+        self._latest = {}
+        self._lock = Lock()
+        self._not_empty = Condition(self._lock)
+        self._not_full = Condition(self._lock)
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def put(self, frame, received_at, product=None):
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                if self.overflow == 'block':
+                    while len(self._items) >= self.maxsize:
+                        self._not_full.wait()
+                else:
+                    item = self._latest.get(product) if self.overflow == 'coalesce' else None
+                    if item is not None:
+                        item[0] = frame
+                        self.coalesced += 1
+                        return
+                    self._forget(self._items.popleft())
+                    self.dropped += 1
+            item = [frame, received_at, product]
+            self._items.append(item)
+            if self.overflow == 'coalesce':
+                self._latest[product] = item
+            if len(self._items) > self.max_depth:
+                self.max_depth = len(self._items)
+            self._not_empty.notify()
+
+    def get(self):
+        ''' Waits for the oldest frame and returns (frame, receive time). '''
+        with self._lock:
+            while not self._items:
+                self._not_empty.wait()
+            item = self._items.popleft()
+            self._forget(item)
+            self._not_full.notify()
+        if item[1] is not None:
+            self.lag.record(time.time() - item[1])
+        return item[0], item[1]
+
+    def close(self):
+        ''' Queues a None frame past any limit, telling the worker to stop once it has handled the frames before. '''
+        with self._lock:
+            self._items.append([None, None, None])
+            self._not_empty.notify()
+
+    def _forget(self, item):
+        if self._latest.get(item[2]) is item:
+            del self._latest[item[2]]
+
+    def metrics(self):
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'lag': self.lag.summary(),
+        }
@@ -0,0 +1,183 @@
+#
+# gdax/replay.py
+#
+# Drives websocket clients and order books from a recorded journal without any network access
+
+from __future__ import print_function
+import json
+import time
+from timeit import default_timer
+
+from gdax.journal import JournalReader
+from gdax.level2_order_book import Level2OrderBook
+from gdax.order_book import OrderBook
+from gdax.stats import LatencyHistogram
+
+
+class JournalSnapshotClient(object):
+    """Stands in for PublicClient in a replayed OrderBook.
+
+    The live book stored a snapshot in the journal every time it resynced,
+    so a replay that hits the same sequence gaps is served the same
+    snapshots, in order.
+
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.served = {}
+
+    def get_product_order_book(self, product_id, level=1):
+        served = self.served.get(product_id, -1)
+        for sequence in self.reader.snapshots(product_id):
+            if sequence > served:
+                self.served[product_id] = sequence
+                return self.reader.load_snapshot(product_id, sequence)
+        raise LookupError('No snapshot of {} after sequence {} in the journal'.format(product_id, served))
+
+
+class ReplayStats(object):
+    """Throughput and per-message handling latency of a replay.
+
+    Latency covers `on_message` only, while throughput also includes
+    reading and decoding the frames.
+
+    """
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.elapsed = 0.0
+
+    @property
+    def messages(self):
+        return self.latency.count
+
+    @property
+    def messages_per_second(self):
+        return self.messages / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        summary = self.latency.summary()
+        lines = ['{} messages in {:.3f}s ({:.0f} msg/s)'.format(self.messages, self.elapsed, self.messages_per_second)]
+        for key in ('mean', 'p50', 'p90', 'p99', 'p99.9', 'max'):
+            if summary[key] is not None:
+                lines.append('  {:>5}: {:8.2f} us'.format(key, summary[key] * 1e6))
+        return '\n'.join(lines)
+
+
+class Replay(object):
+    """Feeds the frames recorded in a journal to a client's `on_message`.
+
+    Any WebsocketClient subclass can be driven. An OrderBook, or each book
+    of a MultiOrderBook, is first seeded from a snapshot stored in the
+    journal. Any resync during the replay is served from the journal too,
+    never from the REST API. A Level2OrderBook is seeded by the channel's
+    own snapshot message, replayed with the other frames.
+
+    Args:
+        client (WebsocketClient): Client to drive. It is never started.
+        path (str): Journal directory written by JournalWriter.
+        speed (Optional[float]): Multiple of real time to replay at, using
+            the recorded receive times. None replays as fast as possible.
+
+    """
+
+    def __init__(self, client, path, speed=None):
+        self.client = client
+        self.reader = JournalReader(path)
+        self.speed = speed
+        self._snapshots = JournalSnapshotClient(self.reader)
+
+    def _books(self):
+        if isinstance(self.client, (OrderBook, Level2OrderBook)):
+            return [self.client]
+        return list(getattr(self.client, 'books', {}).values())
+
+    def _seed(self, start_sequence):
+        """Loads the latest snapshot at or before `start_sequence` (the first one if None) into every book.
+        Returns the sequence of the snapshot for a single book, where the replay can start reading."""
+        sequences = []
+        for book in self._books():
+            book._client = self._snapshots
+            if isinstance(book, Level2OrderBook):
+                # seeded by the snapshot frame, falling back to a recorded REST snapshot only if it was missed
+                continue
+            available = self.reader.snapshots(book.product_id)
+            if start_sequence is not None:
+                available = [sequence for sequence in available if sequence <= start_sequence] or available
+            if not available:
+                raise LookupError('No snapshot of {} in the journal'.format(book.product_id))
+            sequence = available[-1] if start_sequence is not None else available[0]
+            self._snapshots.served[book.product_id] = sequence
+            book.load_snapshot(self.reader.load_snapshot(book.product_id, sequence))
+            sequences.append(sequence)
+        return sequences[0] if len(sequences) == 1 else None
+
+    def run(self, start_time=None, start_sequence=None, limit=None):
+        """Replays the journal and returns ReplayStats.
+
+        Args:
+            start_time (Optional[float]): Skip frames received before this
+                epoch time.
+            start_sequence (Optional[int]): Skip frames before this sequence
+                number, seeding the book from the closest earlier snapshot.
+            limit (Optional[int]): Stop after this many messages.
+
+        """
+        seeded = self._seed(start_sequence)
+        if start_time is None and start_sequence is None:
+            start_sequence = seeded
+
+        stats = ReplayStats()
+        latency = stats.latency
+        on_message = self.client.on_message
+        first_timestamp = None
+        started = default_timer()
+        for timestamp, frame in self.reader.read(start_time, start_sequence):
+            if self.speed:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                delay = (timestamp - first_timestamp) / self.speed - (default_timer() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            message = json.loads(frame.decode('utf-8'))
+            t = default_timer()
+            on_message(message)
+            latency.record(default_timer() - t)
+            if limit is not None and latency.count >= limit:
+                break
+        stats.elapsed = default_timer() - started
+
+        for book in self._books():
+            # let a resync started by the last messages catch up before the caller inspects the book, giving up
+            # instead of retrying if the journal has no snapshot left for it
+            book.stop = True
+            resync_thread = getattr(book, '_resync_thread', None)
+            if resync_thread is not None:
+                resync_thread.join()
+        return stats
+
+
+if __name__ == '__main__':
+    import argparse
+    from gdax.multi_order_book import MultiOrderBook
+
+    parser = argparse.ArgumentParser(description='Replay a recorded gdax feed into an order book.')
+    parser.add_argument('journal', help='journal directory written by JournalWriter')
+    parser.add_argument('--product', action='append', help='product to track, may be repeated (default BTC-USD)')
+    parser.add_argument('--speed', type=float, default=None, help='multiple of real time (default: as fast as possible)')
+    parser.add_argument('--start-sequence', type=int, default=None)
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--quote-increment', default=None, help='replay in fixed-point mode with this tick size')
+    args = parser.parse_args()
+
+    products = args.product or ['BTC-USD']
+    book_kwargs = {}
+    if args.quote_increment:
+        book_kwargs = {'fixed_point': True, 'quote_increment': args.quote_increment}
+    if len(products) == 1:
+        client = OrderBook(product_id=products[0], **book_kwargs)
+    else:
+        client = MultiOrderBook(product_ids=products, **book_kwargs)
+
+    print(Replay(client, args.journal, speed=args.speed).run(start_sequence=args.start_sequence, limit=args.limit))
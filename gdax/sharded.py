@@ -0,0 +1,166 @@
+#
+# gdax/sharded.py
+#
+# Order books for many products spread over worker processes, publishing their top of book through shared memory
+
+from __future__ import print_function
+from collections import namedtuple
+import math
+import multiprocessing
+
+from gdax.book_features import BookFeatures
+from gdax.multi_order_book import MultiOrderBook
+
+
+ShardTop = namedtuple('ShardTop', ['sequence', 'bid', 'bid_size', 'ask', 'ask_size', 'microprice', 'imbalance',
+                                   'trade_flow_imbalance'])
+
+# every product owns a slot of one version number followed by the ShardTop fields
+SLOT_SIZE = 1 + len(ShardTop._fields)
+
+_NAN = float('nan')
+
+
+def _float(value):
+    return _NAN if value is None else float(value)
+
+
+class _SlotWriter(object):
+    ''' Top of book listener copying each TopOfBook of `book`, and its features if tracked, into slot `index`. '''
+
+    def __init__(self, slots, index, book):
+        self._slots = slots
+        self._base = index * SLOT_SIZE
+        self._book = book
+
+    def __call__(self, top):
+        book = self._book
+        fmt = book._format
+        values = [top.sequence,
+                  _NAN if top.bid is None else fmt.price_float(top.bid),
+                  _NAN if top.bid_size is None else fmt.size_float(top.bid_size),
+                  _NAN if top.ask is None else fmt.price_float(top.ask),
+                  _NAN if top.ask_size is None else fmt.size_float(top.ask_size)]
+        if book.features is not None:
+            features = book.features.current
+            values += [_float(features.microprice), _float(features.imbalance),
+                       _float(features.trade_flow_imbalance)]
+        else:
+            values += [_NAN, _NAN, _NAN]
+        slots = self._slots
+        base = self._base
+        # seqlock: readers retry while the version is odd or changed while they copied the slot
+        slots[base] += 1
+        slots[base + 1:base + SLOT_SIZE] = values
+        slots[base] += 1
+
+
+def _run_shard(product_ids, first_slot, slots, stop, level, features, coalesce_ms, book_kwargs):
+    books = MultiOrderBook(product_ids, level=level, **book_kwargs)
+    for i, product_id in enumerate(product_ids):
+        book = books.get_book(product_id)
+        if features is not None:
+            book.features = BookFeatures(**features)
+        book.add_top_of_book_listener(_SlotWriter(slots, first_slot + i, book), coalesce_ms=coalesce_ms)
+    books.start()
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    books.close()
+
+
+class ShardedOrderBook(object):
+    """Tracks the order books of many products in several processes.
+
+    A single interpreter keeps up with only as many messages as one core
+    can decode and apply. ShardedOrderBook deals the products out to
+    `processes` worker processes, each running a MultiOrderBook with its
+    own websocket connection, so the feeds are processed in parallel.
+
+    The books stay in their processes. Whenever the best bid or ask of a
+    product changes, its process writes the new top of book, and the
+    BookFeatures values when `features` is given, into the product's slot
+    of a shared array. get_top reads a slot without any system call or
+    message passing; a version number written before and after each update
+    lets it retry the rare read that overlaps a write.
+
+    Args:
+        product_ids (list): Products to track.
+        processes (Optional[int]): Worker processes, by default one per
+            product up to the number of cores.
+        level (Optional[int]): 3 for OrderBooks, 2 for Level2OrderBooks.
+        features (Optional[dict]): Keyword arguments of a BookFeatures
+            tracked by every book, or None to track none.
+        coalesce_ms (Optional[float]): Most frequent update of a slot, see
+            add_top_of_book_listener.
+        book_kwargs: Passed to each process's MultiOrderBook, such as
+            `reconnect`, and through it to every book, see OrderBook.
+
+    """
+
+    def __init__(self, product_ids=('BTC-USD',), processes=None, level=3, features=None, coalesce_ms=None,
+                 **book_kwargs):
+        self.product_ids = list(product_ids)
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = max(1, min(processes, len(self.product_ids)))
+        # products are dealt out round robin, and each shard's slots are contiguous
+        self.shards = [self.product_ids[i::processes] for i in range(processes)]
+        self._slot = {}
+        for shard in self.shards:
+            for product_id in shard:
+                self._slot[product_id] = len(self._slot)
+        self._slots = multiprocessing.RawArray('d', len(self.product_ids) * SLOT_SIZE)
+        self._stop = multiprocessing.Event()
+        self._processes = []
+        self.level = level
+        self.features = features
+        self.coalesce_ms = coalesce_ms
+        self.book_kwargs = book_kwargs
+
+    def start(self):
+        self._stop.clear()
+        first_slot = 0
+        for shard in self.shards:
+            process = multiprocessing.Process(target=_run_shard, args=(
+                shard, first_slot, self._slots, self._stop, self.level, self.features, self.coalesce_ms,
+                self.book_kwargs))
+            process.daemon = True
+            process.start()
+            self._processes.append(process)
+            first_slot += len(shard)
+
+    def close(self):
+        self._stop.set()
+        for process in self._processes:
+            process.join()
+        self._processes = []
+
+    def version(self, product_id):
+        ''' Returns a number that grows with every update of the product's top of book, 0 before the first. '''
+        return int(self._slots[self._slot[product_id] * SLOT_SIZE]) // 2
+
+    def get_top(self, product_id):
+        ''' Returns the latest ShardTop of the product with float prices and sizes, NaN where unknown, or None
+        before its book has loaded. '''
+        slots = self._slots
+        base = self._slot[product_id] * SLOT_SIZE
+        while True:
+            version = slots[base]
+            if version % 2 == 0:
+                values = slots[base + 1:base + SLOT_SIZE]
+                if slots[base] == version:
+                    break
+        if not version:
+            return None
+        values[0] = int(values[0])
+        return ShardTop(*values)
+
+    def get_bid(self, product_id):
+        top = self.get_top(product_id)
+        return None if top is None or math.isnan(top.bid) else top.bid
+
+    def get_ask(self, product_id):
+        top = self.get_top(product_id)
+        return None if top is None or math.isnan(top.ask) else top.ask
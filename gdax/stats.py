@@ -0,0 +1,67 @@
+#
+# gdax/stats.py
+#
+# Fixed-memory latency histograms
+
+import math
+
+
+class LatencyHistogram(object):
+    """Log-bucketed histogram of durations in seconds.
+
+    Buckets grow geometrically by `precision`, so any recorded value is
+    reported within that relative error while memory stays fixed no matter
+    how many values are recorded.
+
+    """
+
+    def __init__(self, lowest=1e-7, highest=100.0, precision=0.02):
+        self.lowest = lowest
+        self._log_growth = math.log1p(precision)
+        self._growth = 1 + precision
+        self._buckets = [0] * (self._bucket(highest) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        if value <= self.lowest:
+            return 0
+        return int(math.log(value / self.lowest) / self._log_growth) + 1
+
+    def record(self, value):
+        i = self._bucket(value)
+        if i >= len(self._buckets):
+            i = len(self._buckets) - 1
+        self._buckets[i] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p):
+        """Returns the upper bound of the bucket holding the `p`th percentile (0-100) value."""
+        if not self.count:
+            return None
+        rank = max(int(math.ceil(self.count * p / 100.0)), 1)
+        seen = 0
+        for i, n in enumerate(self._buckets):
+            seen += n
+            if seen >= rank:
+                upper = self.lowest * self._growth ** i
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        """Returns a dict of count, mean, min, max and the given percentiles."""
+        result = {'count': self.count, 'mean': self.mean, 'min': self.min, 'max': self.max}
+        for p in percentiles:
+            result['p{:g}'.format(p)] = self.percentile(p)
+        return result
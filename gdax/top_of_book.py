@@ -0,0 +1,66 @@
+#
+# gdax/top_of_book.py
+#
+# Delivers best bid/ask changes of an OrderBook to callbacks off the feed thread
+
+from collections import namedtuple
+from threading import Event, Thread
+import time
+
+
+TopOfBook = namedtuple('TopOfBook', ['sequence', 'bid', 'bid_size', 'ask', 'ask_size'])
+
+
+class TopOfBookListener(Thread):
+    """Calls `callback` with a TopOfBook whenever the best bid or ask price or size of `book` changes.
+
+    The feed thread only records the new top of book and wakes the
+    listener, so callbacks never delay message processing. After each
+    callback the listener waits `coalesce_ms` before looking again: a
+    burst of changes within that time yields a single notification of
+    the latest state. Without coalescing changes that arrive while a
+    callback runs are still merged into the next call.
+
+    Created by OrderBook.add_top_of_book_listener rather than directly.
+
+    """
+
+    def __init__(self, book, callback, coalesce_ms=None):
+        super(TopOfBookListener, self).__init__()
+        self.daemon = True
+        self.book = book
+        self.callback = callback
+        self.interval = coalesce_ms / 1000.0 if coalesce_ms else None
+        self._changed = Event()
+        self._stopped = False
+
+    def notify(self):
+        self._changed.set()
+
+    def stop(self):
+        self._stopped = True
+        self._changed.set()
+
+    def run(self):
+        delivered = None
+        while True:
+            self._changed.wait()
+            if self._stopped:
+                return
+            self._changed.clear()
+            top = self.book._top
+            if top is None or top[1:] == delivered:
+                continue
+            delivered = top[1:]
+            self.callback(self._format(top))
+            if self.interval:
+                time.sleep(self.interval)
+
+    def _format(self, top):
+        sequence, bid, bid_size, ask, ask_size = top
+        fmt = self.book._format
+        if bid is not None:
+            bid, bid_size = fmt.to_price(bid), fmt.to_size(bid_size)
+        if ask is not None:
+            ask, ask_size = fmt.to_price(ask), fmt.to_size(ask_size)
+        return TopOfBook(sequence, bid, bid_size, ask, ask_size)
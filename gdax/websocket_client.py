@@ -8,18 +8,82 @@
 from __future__ import print_function
 import json
 import base64
+import calendar
 import hmac
 import hashlib
+import random
+import socket
 import time
-from threading import Thread
-from websocket import create_connection, WebSocketConnectionClosedException
+from threading import Event, Lock, Thread
+from websocket import ABNF, create_connection, WebSocketConnectionClosedException, WebSocketException
 from pymongo import MongoClient
 from gdax.gdax_auth import get_auth_headers
+from gdax.mongo_sink import MongoSink
+from gdax.receive_queue import ReceiveQueue, frame_product, frame_type
+from gdax.stats import LatencyHistogram
+
+# (first 19 characters, seconds since the epoch) of the last exchange timestamp parsed
+_last_second = ('', 0)
+
+
+def exchange_time(value):
+    ''' Returns the seconds since the epoch of an exchange timestamp such as 2017-11-07T08:19:27.028459Z. The
+    whole seconds are cached, since consecutive messages mostly share them. '''
+    global _last_second
+    prefix, seconds = _last_second
+    if value[:19] != prefix:
+        seconds = calendar.timegm((int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                                   int(value[11:13]), int(value[14:16]), int(value[17:19])))
+        _last_second = (value[:19], seconds)
+    fraction = value[19:-1]
+    return seconds + float(fraction) if fraction else seconds
+
+
+def subscribe_params(products, channels=None, auth=False, api_key="", api_secret="", api_passphrase=""):
+    """ Returns the subscribe message for `products`, signed with the API key when `auth` is set. """
+    if channels is None:
+        sub_params = {'type': 'subscribe', 'product_ids': products}
+    else:
+        sub_params = {'type': 'subscribe', 'product_ids': products, 'channels': channels}
+
+    if auth:
+        timestamp = str(time.time())
+        message = timestamp + 'GET' + '/users/self/verify'
+        message = message.encode('ascii')
+        hmac_key = base64.b64decode(api_secret)
+        signature = hmac.new(hmac_key, message, hashlib.sha256)
+        signature_b64 = base64.b64encode(signature.digest()).decode('utf-8').rstrip('\n')
+        sub_params['signature'] = signature_b64
+        sub_params['key'] = api_key
+        sub_params['passphrase'] = api_passphrase
+        sub_params['timestamp'] = timestamp
+    return sub_params
 
 
 class WebsocketClient(object):
     def __init__(self, url="wss://ws-feed.gdax.com", products=None, message_type="subscribe", mongo_collection=None,
-                 should_print=True, auth=False, api_key="", api_secret="", api_passphrase="", channels=None):
+                 should_print=True, auth=False, api_key="", api_secret="", api_passphrase="", channels=None,
+                 journal=None, workers=0, queue_size=10000, overflow='block', reconnect=False, backoff=1.0,
+                 max_backoff=60.0, ping_interval=30.0, message_types=None, decoder=json.loads):
+        """ With `workers` set, the receive thread only queues raw frames and that many worker threads decode them
+        and call on_message. Frames are assigned to workers by product, so each product's messages stay in order.
+        Each worker's ReceiveQueue holds at most `queue_size` frames and handles overflow with the `overflow`
+        policy, 'block', 'drop_oldest' or 'coalesce'.
+
+        With `reconnect` set, the client is supervised: when the connection drops or cannot be opened it connects
+        again and resubscribes to the same products and channels, re-signing the subscription when `auth` is set,
+        until close() is called. Retries wait `backoff` seconds, doubling up to `max_backoff`, with jitter. After
+        each reconnect on_reconnect is called, and errors passed to on_error no longer stop the client.
+
+        A heartbeat thread pings the server every `ping_interval` seconds, None to disable it, and records the
+        round trip of each pong in `ping_rtt`. A supervised client also reconnects when a ping goes unanswered
+        for a whole interval. For every message with a `time`, the delay from that exchange timestamp to its
+        local receipt is recorded in `latency`, a dict of histograms by message type; see latency_metrics.
+
+        Messages are decoded with `decoder`, json.loads by default, and passed to the handler registered for their
+        type with add_handler, or to on_message if there is none. With `message_types` set, frames of any other
+        type are only journaled: their type is read from the raw frame and they are never decoded. Order books
+        need every message of their channels to follow the sequence, so filtering is for other consumers. """
         self.url = url
         self.products = products
         self.channels = channels
@@ -34,15 +98,57 @@ class WebsocketClient(object):
         self.api_passphrase = api_passphrase
         self.should_print = should_print
         self.mongo_collection = mongo_collection
+        # JournalWriter recording every raw frame as it is received
+        self.journal = journal
+        # whether close() closes the journal rather than only flushing it
+        self._owns_journal = False
+        self.workers = workers
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.queues = []
+        self._workers = []
+        self.reconnect = reconnect
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+        # the error that dropped the last supervised connection
+        self._dropped = None
+        # set by close(), ending the reconnect backoff and the heartbeat
+        self._wakeup = Event()
+        self.ping_interval = ping_interval
+        self.ping_rtt = LatencyHistogram()
+        self.latency = {}
+        self._latency_lock = Lock()
+        self._heartbeat_thread = None
+        # when the last ping was sent, None once its pong has arrived
+        self._ping_at = None
+        self.message_types = frozenset(message_types) if message_types is not None else None
+        self.decoder = decoder
+        # message type -> handler called instead of on_message
+        self.handlers = {}
+        self.skipped = 0
 
     def start(self):
         def _go():
-            self._connect()
-            self._listen()
-            self._disconnect()
+            try:
+                if self.reconnect:
+                    self._supervise()
+                else:
+                    self._connect()
+                    self._listen()
+            finally:
+                self._wakeup.set()
+                self._stop_workers()
+                self._disconnect()
 
         self.stop = False
+        self._wakeup.clear()
         self.on_open()
+        self._start_workers()
+        if self.ping_interval:
+            self._heartbeat_thread = Thread(target=self._heartbeat)
+            self._heartbeat_thread.daemon = True
+            self._heartbeat_thread.start()
         self.thread = Thread(target=_go)
         self.thread.start()
 
@@ -55,56 +161,217 @@ class WebsocketClient(object):
         if self.url[-1] == "/":
             self.url = self.url[:-1]
 
-        if self.channels is None:
-            sub_params = {'type': 'subscribe', 'product_ids': self.products}
-        else:
-            sub_params = {'type': 'subscribe', 'product_ids': self.products, 'channels': self.channels}
-
-        if self.auth:
-            timestamp = str(time.time())
-            message = timestamp + 'GET' + '/users/self/verify'
-            message = message.encode('ascii')
-            hmac_key = base64.b64decode(self.api_secret)
-            signature = hmac.new(hmac_key, message, hashlib.sha256)
-            signature_b64 = base64.b64encode(signature.digest()).decode('utf-8').rstrip('\n')
-            sub_params['signature'] = signature_b64
-            sub_params['key'] = self.api_key
-            sub_params['passphrase'] = self.api_passphrase
-            sub_params['timestamp'] = timestamp
-
         self.ws = create_connection(self.url)
+        self._ping_at = None
+
+        self.ws.send(json.dumps(subscribe_params(self.products, self.channels, self.auth, self.api_key,
+                                                 self.api_secret, self.api_passphrase)))
+
+    def _supervise(self):
+        ''' Keeps the client connected until it is stopped, reconnecting with exponential backoff. '''
+        failures = 0
+        connected = False
+        while not self.stop:
+            try:
+                self._connect()
+            except Exception as e:
+                self._close_socket()
+                reason = e
+            else:
+                if connected:
+                    self.reconnects += 1
+                    self.on_reconnect()
+                connected = True
+                connected_at = time.time()
+                self._dropped = None
+                self._listen()
+                self._close_socket()
+                if self.stop:
+                    return
+                reason = self._dropped
+                if time.time() - connected_at >= self.max_backoff:
+                    # the connection was healthy, so start over from the shortest wait
+                    failures = 0
+            delay = min(self.max_backoff, self.backoff * 2 ** min(failures, 32))
+            # jitter keeps many clients dropped at once from reconnecting in lockstep
+            delay *= 0.5 + random.random() / 2
+            failures += 1
+            print('Error: connection to {} lost ({}). Reconnecting in {:.1f}s.'.format(self.url, reason, delay))
+            self._wakeup.wait(delay)
+
+    def _heartbeat(self):
+        ''' Pings the server every ping_interval seconds, with the time sent as payload so the pong gives the round
+        trip. '''
+        while not self._wakeup.wait(self.ping_interval):
+            ws = self.ws
+            if ws is None:
+                continue
+            try:
+                if self._ping_at is not None and self.reconnect:
+                    print('Error: no pong from {} in {}s. Reconnecting.'.format(self.url, self.ping_interval))
+                    # wakes the receive thread, which reconnects
+                    ws.abort()
+                    self._ping_at = None
+                    continue
+                self._ping_at = time.time()
+                ws.ping('{:.6f}'.format(self._ping_at))
+            except Exception:
+                # the receive thread notices a broken connection too
+                pass
 
-        self.ws.send(json.dumps(sub_params))
+    def _on_pong(self, payload, received_at):
+        try:
+            sent_at = float(payload)
+        except ValueError:
+            # not the answer to one of our pings
+            return
+        self.ping_rtt.record(received_at - sent_at)
+        self._ping_at = None
+
+    def _record_latency(self, msg, received_at):
+        sent = msg.get('time')
+        if sent is None:
+            return
+        try:
+            latency = received_at - exchange_time(sent)
+        except (TypeError, ValueError):
+            return
+        msg_type = msg.get('type')
+        with self._latency_lock:
+            histogram = self.latency.get(msg_type)
+            if histogram is None:
+                histogram = self.latency[msg_type] = LatencyHistogram()
+            histogram.record(latency)
+
+    def latency_metrics(self):
+        """ Returns the summaries of the ping round trips and of the exchange-to-receipt latency by message type,
+        see LatencyHistogram.summary. """
+        with self._latency_lock:
+            latency = dict((msg_type, histogram.summary()) for msg_type, histogram in self.latency.items())
+        return {'ping_rtt': self.ping_rtt.summary(), 'latency': latency}
 
     def _listen(self):
         while not self.stop:
             try:
-                start_t = 0
-                if time.time() - start_t >= 30:
-                    # Set a 30 second ping to keep connection alive
-                    self.ws.ping("keepalive")
-                    start_t = time.time()
-                data = self.ws.recv()
-                msg = json.loads(data)
+                # pongs are returned too, the library answers pings itself
+                opcode, data = self.ws.recv_data(control_frame=True)
+                if opcode == ABNF.OPCODE_CLOSE:
+                    raise WebSocketConnectionClosedException('Connection closed by the server')
+            except Exception as e:
+                if self.reconnect:
+                    # _supervise reconnects
+                    self._dropped = e
+                    return
+                self.on_error(e)
+                continue
+            received_at = time.time()
+            if opcode == ABNF.OPCODE_PONG:
+                self._on_pong(data, received_at)
+                continue
+            if opcode == ABNF.OPCODE_PING:
+                continue
+            if opcode == ABNF.OPCODE_TEXT:
+                data = data.decode('utf-8')
+            try:
+                if self.journal is not None:
+                    self.journal.write(data, received_at)
+                if self.message_types is not None and frame_type(data) not in self.message_types:
+                    self.skipped += 1
+                    continue
+                if self.queues:
+                    self._enqueue(data, received_at)
+                    continue
+                msg = self.decoder(data)
             except ValueError as e:
                 self.on_error(e)
             except Exception as e:
                 self.on_error(e)
             else:
-                self.on_message(msg)
+                self._record_latency(msg, received_at)
+                try:
+                    self._dispatch(msg)
+                except Exception as e:
+                    # like the workers, leave it to on_error whether a failing handler stops the client
+                    self.on_error(e, msg)
 
-    def _disconnect(self):
+    def _start_workers(self):
+        self.queues = [ReceiveQueue(self.queue_size, self.overflow) for _ in range(self.workers)]
+        self._workers = [Thread(target=self._work, args=(q,)) for q in self.queues]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+
+    def _stop_workers(self):
+        for q in self.queues:
+            q.close()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def _enqueue(self, data, received_at):
+        product = None
+        if len(self.queues) > 1 or self.overflow == 'coalesce':
+            product = frame_product(data)
+        q = self.queues[hash(product) % len(self.queues)] if len(self.queues) > 1 else self.queues[0]
+        q.put(data, received_at, product)
+
+    def _work(self, q):
+        while True:
+            data, received_at = q.get()
+            if data is None:
+                return
+            try:
+                msg = self.decoder(data)
+            except ValueError as e:
+                self.on_error(e, data)
+            else:
+                self._record_latency(msg, received_at)
+                try:
+                    self._dispatch(msg)
+                except Exception as e:
+                    self.on_error(e, msg)
+
+    def add_handler(self, msg_type, handler):
+        """ Calls `handler` with every message of `msg_type` instead of on_message. """
+        self.handlers[msg_type] = handler
+
+    def remove_handler(self, msg_type):
+        self.handlers.pop(msg_type, None)
+
+    def _dispatch(self, msg):
+        handler = self.handlers.get(msg.get('type'))
+        if handler is not None:
+            handler(msg)
+        else:
+            self.on_message(msg)
+
+    def queue_metrics(self):
+        """ Returns the ReceiveQueue metrics of each worker, see ReceiveQueue.metrics. """
+        return [q.metrics() for q in self.queues]
+
+    def _close_socket(self):
         try:
             if self.ws:
                 self.ws.close()
-        except WebSocketConnectionClosedException as e:
+        except (WebSocketException, socket.error):
+            # the connection is already broken
             pass
 
+    def _disconnect(self):
+        self._close_socket()
         self.on_close()
 
     def close(self):
         self.stop = True
+        self._wakeup.set()
         self.thread.join()
+        if self.journal is not None:
+            if self._owns_journal:
+                self.journal.close()
+            else:
+                self.journal.flush()
+        if isinstance(self.mongo_collection, MongoSink):
+            self.mongo_collection.flush()
 
     def on_open(self):
         if self.should_print:
@@ -120,9 +387,16 @@ class WebsocketClient(object):
         if self.mongo_collection:  # dump JSON to given mongo collection
             self.mongo_collection.insert_one(msg)
 
+    def on_reconnect(self):
+        ''' Called once the client has reconnected and resubscribed, before the first message of the new connection.
+        Messages sent while it was disconnected are lost. '''
+        if self.should_print:
+            print("-- Reconnected! --\n")
+
     def on_error(self, e, data=None):
         self.error = e
-        self.stop = True
+        if not self.reconnect:
+            self.stop = True
         print('{} - data: {}'.format(e, data))
 
 
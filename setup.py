@@ -14,6 +14,11 @@ tests_require = [
     'pytest',
     ]
 
+extras_require = {
+    # AsyncWebsocketClient
+    'asyncio': ['websockets>=6.0'],
+}
+
 setup(
     name='gdax',
     version='1.0.6',
@@ -21,9 +26,10 @@ setup(
     author_email='dpaq34@gmail.com',
     license='MIT',
     url='https://github.com/danpaquin/gdax-python',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'tests']),
     install_requires=install_requires,
     tests_require=tests_require,
+    extras_require=extras_require,
     description='The unofficial Python client for the GDAX API',
     download_url='https://github.com/danpaquin/gdax-Python/archive/master.zip',
     keywords=['gdax', 'gdax-api', 'orderbook', 'trade', 'bitcoin', 'ethereum', 'BTC', 'ETH', 'client', 'api', 'wrapper', 'exchange', 'crypto', 'currency', 'trading', 'trading-api', 'coinbase'],
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from decimal import Decimal
+import gdax
+from gdax.order_book import OrderBook
+from tests.test_order_book import SNAPSHOT, message
+
+
+class FakeSocket(object):
+    ''' Serves queued frames to AsyncWebsocketClient, like a websockets connection. '''
+
+    def __init__(self, frames=()):
+        self.sent = []
+        self.closed = False
+        self.frames = asyncio.Queue()
+        for frame in frames:
+            self.frames.put_nowait(frame)
+
+    async def send(self, data):
+        self.sent.append(json.loads(data))
+
+    async def recv(self):
+        frame = await self.frames.get()
+        if frame is None:
+            raise ConnectionError('closed')
+        return frame
+
+    async def close(self):
+        self.closed = True
+        self.frames.put_nowait(None)
+
+
+class RecordingClient(gdax.AsyncWebsocketClient):
+    def __init__(self, frames=(), **kwargs):
+        super(RecordingClient, self).__init__(should_print=False, **kwargs)
+        self.socket = FakeSocket(frames)
+        self.events = []
+
+    async def _open_socket(self):
+        return self.socket
+
+    def on_open(self):
+        self.events.append('open')
+
+    async def on_message(self, msg):
+        await asyncio.sleep(0)
+        self.events.append(msg['sequence'])
+
+    def on_error(self, e, data=None):
+        self.events.append('error')
+
+    def on_close(self):
+        self.events.append('close')
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAsyncWebsocketClient(object):
+
+    def test_run_calls_hooks(self):
+        client = RecordingClient(['{"sequence": 1}', 'not json', '{"sequence": 2}'], products='ETH-USD',
+                                 channels=['ticker'])
+
+        async def main():
+            task = client.start()
+            while len(client.events) < 4:
+                await asyncio.sleep(0.001)
+            await client.close()
+            return task
+
+        task = run(main())
+        assert task.done() and task.exception() is None
+        assert client.events == ['open', 1, 'error', 2, 'close']
+        assert client.socket.sent == [{'type': 'subscribe', 'product_ids': ['ETH-USD'], 'channels': ['ticker']}]
+        assert client.socket.closed
+
+    def test_on_error_stops_client(self):
+        client = gdax.AsyncWebsocketClient(should_print=False)
+        client._open_socket = lambda: asyncio.sleep(0, FakeSocket(['{"sequence": 1}', 'not json', '{}']))
+        run(client.run())
+        assert client.stop and isinstance(client.error, ValueError)
+
+    def test_dropped_connection_ends_messages(self):
+        client = RecordingClient(['{"sequence": 1}'])
+        client.socket.frames.put_nowait(None)
+
+        async def main():
+            await client.connect()
+            # on_error does not stop the client, but the stream still ends with the connection
+            return [msg['sequence'] async for msg in client]
+
+        assert run(asyncio.wait_for(main(), 5)) == [1]
+        assert client.events == ['open', 'error']
+        assert not client.stop
+
+    def test_feeds_order_book(self):
+        book = OrderBook(product_id='BTC-USD', should_print=False)
+        book.load_snapshot(SNAPSHOT)
+        frames = [
+            message(101, type='done', side='sell', order_id='a1', price='100.02', remaining_size='1.0',
+                    reason='canceled'),
+            message(102, type='open', side='buy', order_id='b5', price='100.02', remaining_size='1.0'),
+        ]
+        feed = RecordingClient([json.dumps(frame) for frame in frames], products=[book.product_id])
+
+        async def main():
+            await feed.connect()
+            async for msg in feed:
+                book.on_message(msg)
+                if msg['sequence'] == 102:
+                    await feed.close()
+
+        run(main())
+        assert book._sequence == 102
+        assert book.get_bid() == Decimal('100.02')
+        assert book.get_ask() == Decimal('100.03')
@@ -0,0 +1,60 @@
+import pytest
+import gdax
+from gdax.book_features import BookFeatures
+from benchmarks.synthetic_feed import SyntheticFeed
+from tests.test_order_book import SNAPSHOT, message
+
+
+@pytest.fixture(params=[False, True], ids=['decimal', 'fixed_point'])
+def book(request):
+    order_book = gdax.OrderBook(product_id='BTC-USD', fixed_point=request.param, quote_increment='0.01',
+                                features=BookFeatures(depth=1, trade_window=2))
+    order_book.load_snapshot(SNAPSHOT)
+    return order_book
+
+
+class TestBookFeatures(object):
+
+    def test_snapshot_features(self, book):
+        features = book.features.current
+        assert features.bid == pytest.approx(100.01)
+        assert features.ask == pytest.approx(100.02)
+        assert features.spread == pytest.approx(0.01)
+        # 2.0 bid against 1.0 ask leans the microprice towards the ask
+        assert features.microprice == pytest.approx((100.01 * 1.0 + 100.02 * 2.0) / 3.0)
+        assert features.imbalance == pytest.approx(1.0 / 3.0)
+        assert features.trade_flow_imbalance is None
+
+    def test_changes_outside_depth_are_skipped(self, book):
+        before = book.features.current
+        book.on_message(message(101, type='open', side='buy', order_id='b4', price='100.00', remaining_size='5.0'))
+        assert book.features.current is before
+
+        book.on_message(message(102, type='open', side='buy', order_id='b5', price='100.01', remaining_size='1.0'))
+        assert book.features.current.bid_size == pytest.approx(3.0)
+        assert book.features.current.imbalance == pytest.approx(0.5)
+
+    def test_trade_flow_window(self, book):
+        book.on_message(message(101, type='match', side='sell', maker_order_id='a1', taker_order_id='t1',
+                                price='100.02', size='0.25'))
+        assert book.features.current.trade_flow_imbalance == pytest.approx(1.0)
+        book.on_message(message(102, type='match', side='buy', maker_order_id='b1', taker_order_id='t2',
+                                price='100.01', size='0.75'))
+        assert book.features.current.trade_flow_imbalance == pytest.approx(-0.5)
+        book.on_message(message(103, type='match', side='buy', maker_order_id='b1', taker_order_id='t3',
+                                price='100.01', size='0.25'))
+        # the first trade has left the window of two
+        assert book.features.current.trade_flow_imbalance == pytest.approx(-1.0)
+
+    def test_synthetic_stream_matches_recomputed(self):
+        feed = SyntheticFeed(levels=20, orders_per_level=5, volatility=1.0, seed=3)
+        order_book = gdax.OrderBook(product_id='BTC-USD', fixed_point=True, quote_increment='0.01',
+                                    features=BookFeatures(depth=5))
+        order_book.load_snapshot(feed.snapshot())
+        for msg in feed.messages(5000):
+            order_book.on_message(msg)
+
+        expected = BookFeatures(depth=5)
+        expected.reset(order_book)
+        for field in ('bid', 'bid_size', 'ask', 'ask_size', 'microprice', 'imbalance'):
+            assert getattr(order_book.features.current, field) == pytest.approx(getattr(expected.current, field))
@@ -0,0 +1,79 @@
+import pytest
+import gdax
+from gdax.book_verifier import BookVerifier
+from tests.test_order_book import SNAPSHOT, SnapshotClient, message
+
+
+LEVEL2 = {
+    'sequence': 100,
+    'bids': [['100.01', '2.0', 2], ['100.00', '2.0', 1]],
+    'asks': [['100.02', '1.0', 1], ['100.03', '3.0', 1]],
+}
+
+
+class Level2Client(SnapshotClient):
+    ''' Serves a level 2 snapshot, first applying `ahead` messages to the book as the feed would meanwhile. '''
+
+    def __init__(self, snapshot, level2, book=None, ahead=()):
+        super(Level2Client, self).__init__(snapshot)
+        self.level2 = level2
+        self.book = book
+        self.ahead = ahead
+
+    def get_product_order_book(self, product_id, level=1):
+        if level != 2:
+            return self.snapshot
+        for msg in self.ahead:
+            self.book.on_message(msg)
+        return self.level2
+
+
+@pytest.fixture(params=[False, True], ids=['decimal', 'fixed_point'])
+def book(request):
+    order_book = gdax.OrderBook(product_id='BTC-USD', fixed_point=request.param, quote_increment='0.01')
+    order_book.load_snapshot(SNAPSHOT)
+    return order_book
+
+
+class TestBookVerifier(object):
+
+    def test_consistent_book(self, book):
+        book._client = Level2Client(SNAPSHOT, LEVEL2)
+        report = BookVerifier(book).check()
+        assert report == (100, 4, 0, 0.0, False)
+        assert not book._resync_requested
+
+    def test_rewinds_to_snapshot_sequence(self, book):
+        ahead = [
+            message(101, type='done', side='sell', order_id='a1', price='100.02', remaining_size='1.0',
+                    reason='canceled'),
+            message(102, type='change', side='buy', order_id='b1', price='100.01', old_size='1.5', new_size='1.0'),
+            # a new best bid pushes the untouched 100.00 level down
+            message(103, type='open', side='buy', order_id='b5', price='100.02', remaining_size='1.0'),
+        ]
+        book._client = Level2Client(SNAPSHOT, LEVEL2, book, ahead)
+        assert BookVerifier(book, depth=2).check().mismatched_levels == 0
+        assert book._sequence == 103
+        assert book._change_log is None
+
+    def test_drift_requests_resync(self, book):
+        drifted = dict(LEVEL2, asks=[['100.02', '1.5', 2], ['100.03', '3.0', 1]])
+        book._client = Level2Client(SNAPSHOT, drifted)
+        verifier = BookVerifier(book)
+        report = verifier.check()
+        assert report.mismatched_levels == 1
+        assert report.size_drift == pytest.approx(0.5 / 8.5)
+        assert report.resynced and verifier.resyncs == 1
+
+        book._client = SnapshotClient(SNAPSHOT)
+        book.on_message(message(101, type='received', side='buy', order_id='b5'))
+        book._resync_thread.join(5)
+        assert not book._resync_requested
+        assert book._sequence == 101
+
+    def test_snapshot_ahead_of_book_is_inconclusive(self, book):
+        book._client = Level2Client(SNAPSHOT, dict(LEVEL2, sequence=200))
+        verifier = BookVerifier(book, timeout=0.05)
+        assert verifier.check() is None
+        assert verifier.inconclusive == 1
+        assert book._change_log is None
@@ -0,0 +1,56 @@
+import json
+from gdax.journal import JournalReader, JournalWriter
+
+
+def frame(sequence):
+    return json.dumps({'type': 'open', 'sequence': sequence, 'product_id': 'BTC-USD'})
+
+
+class TestJournal(object):
+
+    def test_round_trip(self, tmpdir):
+        writer = JournalWriter(str(tmpdir))
+        writer.write(frame(1), 10.0)
+        writer.write(frame(2), 11.0)
+        writer.close()
+
+        records = list(JournalReader(str(tmpdir)))
+        assert [timestamp for timestamp, _ in records] == [10.0, 11.0]
+        assert json.loads(records[1][1].decode('utf-8'))['sequence'] == 2
+
+    def test_flush_reaches_disk(self, tmpdir):
+        writer = JournalWriter(str(tmpdir), flush_interval=60)
+        for sequence in range(3):
+            writer.write(frame(sequence), 10.0 + sequence)
+        writer.flush()
+        assert len(list(JournalReader(str(tmpdir)))) == 3
+        writer.close()
+
+    def test_rotation_and_seek(self, tmpdir):
+        writer = JournalWriter(str(tmpdir), max_file_size=1000, index_interval=3)
+        for sequence in range(100):
+            writer.write(frame(sequence), 1000.0 + sequence)
+        writer.close()
+
+        reader = JournalReader(str(tmpdir))
+        assert len(reader.files) > 1
+        assert [json.loads(f.decode('utf-8'))['sequence'] for _, f in reader] == list(range(100))
+
+        by_sequence = list(reader.read(start_sequence=57))
+        assert json.loads(by_sequence[0][1].decode('utf-8'))['sequence'] == 57
+        assert len(by_sequence) == 43
+
+        by_time = list(reader.read(start_time=1090.5))
+        assert by_time[0][0] == 1091.0
+
+    def test_reopen_continues_numbering(self, tmpdir):
+        writer = JournalWriter(str(tmpdir))
+        writer.write(frame(1))
+        writer.close()
+        writer = JournalWriter(str(tmpdir))
+        writer.write(frame(2))
+        writer.close()
+
+        reader = JournalReader(str(tmpdir))
+        assert reader.files == [1, 2]
+        assert len(list(reader)) == 2
@@ -0,0 +1,91 @@
+import pytest
+import gdax
+from decimal import Decimal
+from gdax.book_features import BookFeatures
+
+
+SNAPSHOT = {
+    'sequence': 100,
+    'bids': [['100.01', '2.0', 2], ['100.00', '2.0', 1]],
+    'asks': [['100.02', '1.0', 1], ['100.03', '3.0', 1]],
+}
+
+
+class SnapshotClient(object):
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.levels = []
+
+    def get_product_order_book(self, product_id, level=1):
+        self.levels.append(level)
+        return self.snapshot
+
+
+@pytest.fixture(params=[False, True], ids=['decimal', 'fixed_point'])
+def book(request):
+    order_book = gdax.Level2OrderBook(product_id='BTC-USD', fixed_point=request.param, quote_increment='0.01')
+    order_book._client = SnapshotClient(SNAPSHOT)
+    order_book.reset_book()
+    return order_book
+
+
+def l2update(*changes):
+    return {'type': 'l2update', 'product_id': 'BTC-USD', 'changes': [list(change) for change in changes]}
+
+
+class TestLevel2OrderBook(object):
+
+    def test_subscribes_to_level2(self, book):
+        assert book.channels == ['level2', 'matches']
+        assert book._client.levels == [2]
+        assert book.get_depth('buy') == [[Decimal('100.01'), Decimal('2.0'), None],
+                                         [Decimal('100.00'), Decimal('2.0'), None]]
+
+    def test_l2update(self, book):
+        book.on_message(l2update(('buy', '100.01', '0.5'), ('sell', '100.02', '0'), ('sell', '100.04', '4.0')))
+        assert book.get_level(Decimal('100.01')) == [Decimal('0.5'), None]
+        assert book.get_level(Decimal('100.02')) is None
+        assert book.get_ask() == Decimal('100.03')
+        assert book.get_snapshot().asks == ((Decimal('100.03'), Decimal('3.0'), None),
+                                            (Decimal('100.04'), Decimal('4.0'), None))
+
+    def test_channel_snapshot_replaces_book(self, book):
+        book.on_message({'type': 'snapshot', 'product_id': 'BTC-USD',
+                         'bids': [['99.00', '1.0']], 'asks': [['101.00', '1.5']]})
+        assert book.get_bid() == Decimal('99.00')
+        assert book.get_depth('sell') == [[Decimal('101.00'), Decimal('1.5'), None]]
+
+    def test_missed_snapshot_seeds_from_rest(self):
+        order_book = gdax.Level2OrderBook(product_id='BTC-USD')
+        order_book._client = SnapshotClient(SNAPSHOT)
+        order_book.on_message(l2update(('buy', '100.02', '1.0')))
+        assert order_book.get_bid() == Decimal('100.02')
+        assert order_book.get_level(Decimal('100.01')) == [Decimal('2.0'), None]
+
+    def test_depth_arrays(self, book):
+        np = pytest.importorskip('numpy')
+        depth = book.get_depth_arrays(5)
+        assert np.allclose(depth.bid_prices, [100.01, 100.00])
+        assert np.allclose(depth.ask_sizes, [1.0, 3.0])
+        assert np.isnan(depth.bid_counts).all()
+
+    def test_features_and_ticker(self):
+        order_book = gdax.Level2OrderBook(product_id='BTC-USD', features=BookFeatures(depth=1))
+        order_book.load_snapshot(SNAPSHOT)
+        assert order_book.features.current.imbalance == pytest.approx(1.0 / 3.0)
+
+        order_book.on_message(l2update(('sell', '100.02', '2.0')))
+        assert order_book.features.current.imbalance == pytest.approx(0.0)
+
+        match = {'type': 'match', 'product_id': 'BTC-USD', 'side': 'sell', 'price': '100.02', 'size': '0.5'}
+        order_book.on_message(match)
+        assert order_book.get_current_ticker() is match
+        assert order_book.features.current.trade_flow_imbalance == pytest.approx(1.0)
+
+    def test_multi_order_book(self):
+        order_books = gdax.MultiOrderBook(product_ids=['BTC-USD', 'ETH-USD'], level=2)
+        assert order_books.channels == ['level2', 'matches']
+        order_books.on_message({'type': 'snapshot', 'product_id': 'ETH-USD',
+                                'bids': [['300.00', '1.0']], 'asks': [['300.01', '2.0']]})
+        assert order_books.get_book('ETH-USD').get_ask() == Decimal('300.01')
+        assert isinstance(order_books.get_book('BTC-USD'), gdax.Level2OrderBook)
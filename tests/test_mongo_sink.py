@@ -0,0 +1,92 @@
+import threading
+import pytest
+from gdax.mongo_sink import MongoSink
+
+
+class FakeCollection(object):
+    ''' In-process stand-in for a pymongo collection, optionally holding every insert_many until `release`. '''
+
+    def __init__(self, hold=False, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def insert_many(self, documents, ordered=True):
+        assert not ordered
+        self.release.wait()
+        if self.fail:
+            raise IOError('not master')
+        self.batches.append(list(documents))
+
+    @property
+    def documents(self):
+        return [document for batch in self.batches for document in batch]
+
+
+def message(sequence):
+    return {'type': 'match', 'sequence': sequence}
+
+
+class TestMongoSink(object):
+
+    def test_batches_by_size(self):
+        collection = FakeCollection()
+        sink = MongoSink(collection, batch_size=10, flush_interval=60)
+        for sequence in range(25):
+            sink.insert_one(message(sequence))
+        sink.flush()
+        assert collection.documents == [message(sequence) for sequence in range(25)]
+        assert all(len(batch) <= 10 for batch in collection.batches)
+        assert sink.metrics()['written'] == 25
+        sink.close()
+
+    def test_flushes_on_interval(self):
+        collection = FakeCollection()
+        sink = MongoSink(collection, batch_size=1000, flush_interval=0.01)
+        sink.insert_one(message(1))
+        sink._thread.join(0.5)
+        assert collection.documents == [message(1)]
+        sink.close()
+
+    def test_drop_when_full(self):
+        collection = FakeCollection(hold=True)
+        sink = MongoSink(collection, batch_size=1, flush_interval=0, max_pending=2, overflow='drop')
+        sink.insert_one(message(0))
+        # the writer is now stuck inserting the first document
+        while sink._queue.qsize():
+            pass
+        for sequence in range(1, 5):
+            sink.insert_one(message(sequence))
+        assert sink.dropped == 2
+        collection.release.set()
+        sink.close()
+        assert collection.documents == [message(0), message(1), message(2)]
+
+    def test_block_when_full(self):
+        collection = FakeCollection(hold=True)
+        sink = MongoSink(collection, batch_size=1, flush_interval=0, max_pending=1)
+        sink.insert_one(message(0))
+        while sink._queue.qsize():
+            pass
+        sink.insert_one(message(1))
+        producer = threading.Thread(target=sink.insert_one, args=(message(2),))
+        producer.start()
+        producer.join(0.05)
+        assert producer.is_alive() and sink.blocked == 1
+        collection.release.set()
+        producer.join(5)
+        sink.close()
+        assert collection.documents == [message(0), message(1), message(2)]
+
+    def test_failed_batches_are_counted(self):
+        sink = MongoSink(FakeCollection(fail=True), batch_size=2)
+        for sequence in range(3):
+            sink.insert_one(message(sequence))
+        sink.close()
+        assert (sink.failed, sink.written) == (3, 0)
+
+    def test_invalid_policy(self):
+        with pytest.raises(ValueError):
+            MongoSink(FakeCollection(), overflow='spill')
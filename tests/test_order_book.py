@@ -0,0 +1,491 @@
+import json
+import sys
+import pytest
+import gdax
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+from decimal import Decimal
+from benchmarks.synthetic_feed import SyntheticFeed
+from gdax.journal import JournalReader
+from gdax.order_book_stream import iter_order_book
+
+
+SNAPSHOT = {
+    'sequence': 100,
+    'bids': [
+        ['100.01', '1.5', 'b1'],
+        ['100.01', '0.5', 'b2'],
+        ['100.00', '2.0', 'b3'],
+    ],
+    'asks': [
+        ['100.02', '1.0', 'a1'],
+        ['100.03', '3.0', 'a2'],
+    ],
+}
+
+
+class SnapshotClient(object):
+    ''' Stands in for PublicClient so the book can be seeded without network access. '''
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def get_product_order_book(self, product_id, level=1):
+        return self.snapshot
+
+    def get_products(self):
+        return [{'id': 'BTC-USD', 'quote_increment': '0.01'}]
+
+
+class StreamingSnapshotClient(SnapshotClient):
+    ''' Serves the snapshot through stream_product_order_book, in small chunks of its JSON body. '''
+
+    def stream_product_order_book(self, product_id, level=3, tee=None):
+        body = json.dumps(self.snapshot).encode('utf-8')
+        chunks = [body[i:i + 16] for i in range(0, len(body), 16)]
+        if tee is not None:
+            for chunk in chunks:
+                tee.write(chunk)
+        return iter_order_book(chunks)
+
+
+class SlowSnapshotClient(SnapshotClient):
+    ''' Holds the snapshot download until released, like a slow level-3 REST call. '''
+
+    def __init__(self, snapshot):
+        super(SlowSnapshotClient, self).__init__(snapshot)
+        self.released = threading.Event()
+
+    def get_product_order_book(self, product_id, level=1):
+        self.released.wait(5)
+        return self.snapshot
+
+
+class QueuedSnapshotClient(SlowSnapshotClient):
+    ''' Serves each of `snapshots` in turn once released. '''
+
+    def __init__(self, snapshots):
+        super(QueuedSnapshotClient, self).__init__(snapshots[0])
+        self.snapshots = list(snapshots)
+
+    def get_product_order_book(self, product_id, level=1):
+        self.released.wait(5)
+        return self.snapshots.pop(0)
+
+
+def wait_for_resync(order_book):
+    deadline = time.time() + 5
+    while order_book._resyncing and time.time() < deadline:
+        time.sleep(0.01)
+    assert not order_book._resyncing
+
+
+@pytest.fixture(params=[False, True], ids=['decimal', 'fixed_point'])
+def book(request):
+    order_book = gdax.OrderBook(product_id='BTC-USD', fixed_point=request.param, quote_increment='0.01')
+    order_book._client = SnapshotClient(SNAPSHOT)
+    order_book.reset_book()
+    return order_book
+
+
+def message(sequence, **fields):
+    fields['sequence'] = sequence
+    fields.setdefault('product_id', 'BTC-USD')
+    return fields
+
+
+class TestOrderBook(object):
+
+    def test_reset_book(self, book):
+        assert book.get_bid() == Decimal('100.01')
+        assert book.get_ask() == Decimal('100.02')
+        assert [o['id'] for o in book.get_bids(Decimal('100.01'))] == ['b1', 'b2']
+
+    def test_open_and_done(self, book):
+        book.on_message(message(101, type='open', side='buy', order_id='b4',
+                                price='100.01', remaining_size='0.25'))
+        assert [o['id'] for o in book.get_bids(Decimal('100.01'))] == ['b1', 'b2', 'b4']
+
+        book.on_message(message(102, type='done', side='buy', order_id='b2',
+                                price='100.01', remaining_size='0.5', reason='canceled'))
+        assert [o['id'] for o in book.get_bids(Decimal('100.01'))] == ['b1', 'b4']
+
+        book.on_message(message(103, type='done', side='buy', order_id='b3',
+                                price='100.00', remaining_size='2.0', reason='canceled'))
+        assert book.get_bids(Decimal('100.00')) is None
+
+    def test_match(self, book):
+        book.on_message(message(101, type='match', side='sell', maker_order_id='a1',
+                                taker_order_id='t1', price='100.02', size='0.4'))
+        assert book.get_asks(Decimal('100.02'))[0]['size'] == Decimal('0.6')
+        assert book.get_current_ticker()['maker_order_id'] == 'a1'
+
+        book.on_message(message(102, type='match', side='sell', maker_order_id='a1',
+                                taker_order_id='t2', price='100.02', size='0.6'))
+        assert book.get_asks(Decimal('100.02')) is None
+        assert book.get_ask() == Decimal('100.03')
+
+    def test_change(self, book):
+        book.on_message(message(101, type='change', side='buy', order_id='b2',
+                                price='100.01', old_size='0.5', new_size='0.1'))
+        assert book.get_bids(Decimal('100.01'))[1]['size'] == Decimal('0.1')
+
+    def test_messages_before_snapshot_are_ignored(self, book):
+        book.on_message(message(100, type='done', side='buy', order_id='b1',
+                                price='100.01', remaining_size='1.5', reason='canceled'))
+        assert len(book.get_bids(Decimal('100.01'))) == 2
+
+    def test_get_current_book(self, book):
+        result = book.get_current_book()
+        assert result['sequence'] == 100
+        assert result['bids'][-1] == [Decimal('100.01'), Decimal('0.5'), 'b2']
+        assert result['asks'][0] == [Decimal('100.02'), Decimal('1.0'), 'a1']
+
+    def test_level_aggregates(self, book):
+        assert book.get_level(Decimal('100.01')) == [Decimal('2.0'), 2]
+        assert book.get_level(Decimal('99.99')) is None
+
+        book.on_message(message(101, type='open', side='buy', order_id='b4',
+                                price='100.01', remaining_size='0.25'))
+        book.on_message(message(102, type='change', side='buy', order_id='b1',
+                                price='100.01', old_size='1.5', new_size='1.0'))
+        book.on_message(message(103, type='match', side='buy', maker_order_id='b1',
+                                taker_order_id='t1', price='100.01', size='0.5'))
+        assert book.get_level(Decimal('100.01')) == [Decimal('1.25'), 3]
+
+        book.on_message(message(104, type='done', side='buy', order_id='b2',
+                                price='100.01', remaining_size='0.5', reason='canceled'))
+        assert book.get_level(Decimal('100.01')) == [Decimal('0.75'), 2]
+
+    def test_get_depth(self, book):
+        assert book.get_depth('buy', 1) == [[Decimal('100.01'), Decimal('2.0'), 2]]
+        assert book.get_depth('buy') == [[Decimal('100.01'), Decimal('2.0'), 2],
+                                         [Decimal('100.00'), Decimal('2.0'), 1]]
+        assert book.get_depth('sell', 5) == [[Decimal('100.02'), Decimal('1.0'), 1],
+                                             [Decimal('100.03'), Decimal('3.0'), 1]]
+
+    def test_messages_during_resync_are_replayed(self):
+        order_book = gdax.OrderBook(product_id='BTC-USD')
+        client = order_book._client = SlowSnapshotClient(SNAPSHOT)
+        order_book.on_message(message(99, type='received', side='buy', order_id='b0'))
+        order_book.on_message(message(100, type='open', side='buy', order_id='b0',
+                                      price='99.00', remaining_size='1.0'))
+        order_book.on_message(message(101, type='open', side='buy', order_id='b4',
+                                      price='100.01', remaining_size='0.25'))
+        order_book.on_message(message(102, type='done', side='sell', order_id='a1',
+                                      price='100.02', remaining_size='1.0', reason='canceled'))
+        assert order_book._resyncing
+
+        client.released.set()
+        order_book._resync_thread.join(5)
+        assert not order_book._resyncing
+        assert order_book._sequence == 102
+        assert order_book.get_bids(Decimal('99.00')) is None
+        assert order_book.get_level(Decimal('100.01')) == [Decimal('2.25'), 3]
+        assert order_book.get_ask() == Decimal('100.03')
+
+        order_book.on_message(message(103, type='done', side='buy', order_id='b4',
+                                      price='100.01', remaining_size='0.25', reason='canceled'))
+        assert order_book.get_level(Decimal('100.01')) == [Decimal('2.0'), 2]
+
+    def test_failed_replay_resyncs(self):
+        order_book = gdax.OrderBook(product_id='BTC-USD')
+        client = order_book._client = QueuedSnapshotClient([SNAPSHOT, dict(SNAPSHOT, sequence=101)])
+        # b2 is not at the head of its level, so applying the match fails
+        order_book.on_message(message(101, type='match', side='buy', maker_order_id='b2', taker_order_id='t1',
+                                      price='100.01', size='0.1'))
+        order_book.on_message(message(102, type='done', side='sell', order_id='a1',
+                                      price='100.02', remaining_size='1.0', reason='canceled'))
+        client.released.set()
+        wait_for_resync(order_book)
+        assert order_book._sequence == 102
+        assert order_book._resync_buffer == []
+        assert order_book.get_ask() == Decimal('100.03')
+
+    def test_failed_message_resyncs(self, book):
+        book._client = SnapshotClient(dict(SNAPSHOT, sequence=101, bids=[['100.01', '0.4', 'b2']]))
+        # b2 is not at the head of its level, so the book has diverged from the exchange
+        book.on_message(message(101, type='match', side='buy', maker_order_id='b2', taker_order_id='t1',
+                                price='100.01', size='0.1'))
+        book._resync_thread.join(5)
+        assert not book._resyncing
+        assert book._sequence == 101
+        assert book.get_level(Decimal('100.01')) == [Decimal('0.4'), 1]
+
+    def test_resync_buffer_is_bounded(self):
+        order_book = gdax.OrderBook(product_id='BTC-USD')
+        order_book.max_resync_buffer = 2
+        client = order_book._client = QueuedSnapshotClient([SNAPSHOT, dict(SNAPSHOT, sequence=102)])
+        for sequence in (101, 102, 103):
+            order_book.on_message(message(sequence, type='received', side='buy', order_id='b{}'.format(sequence)))
+        assert [msg['sequence'] for msg in order_book._resync_buffer] == [103]
+
+        # the gap left by the dropped messages is filled by a second snapshot
+        client.released.set()
+        wait_for_resync(order_book)
+        assert order_book._sequence == 103
+
+    def test_sequence_gap_resyncs(self, book):
+        snapshot = dict(SNAPSHOT, sequence=104, asks=[['100.05', '1.0', 'a3']])
+        book._client = SnapshotClient(snapshot)
+        book.on_message(message(105, type='open', side='sell', order_id='a4',
+                                price='100.04', remaining_size='2.0'))
+        book._resync_thread.join(5)
+        assert book._sequence == 105
+        assert book.get_depth('sell') == [[Decimal('100.04'), Decimal('2.0'), 1],
+                                          [Decimal('100.05'), Decimal('1.0'), 1]]
+
+    def test_get_current_book_depth(self, book):
+        result = book.get_current_book(depth=1)
+        assert result['bids'] == [[Decimal('100.01'), Decimal('1.5'), 'b1'], [Decimal('100.01'), Decimal('0.5'), 'b2']]
+        assert result['asks'] == [[Decimal('100.02'), Decimal('1.0'), 'a1']]
+
+    def test_get_snapshot(self, book):
+        snapshot = book.get_snapshot(depth=1)
+        assert snapshot.sequence == 100
+        assert snapshot.bids == ((Decimal('100.01'), Decimal('2.0'), 2),)
+        assert snapshot.asks == ((Decimal('100.02'), Decimal('1.0'), 1),)
+        assert book.get_snapshot(depth=1) is snapshot
+
+        book.on_message(message(101, type='done', side='sell', order_id='a1',
+                                price='100.02', remaining_size='1.0', reason='canceled'))
+        assert snapshot.asks == ((Decimal('100.02'), Decimal('1.0'), 1),)
+        updated = book.get_snapshot(depth=1)
+        assert updated.sequence == 101
+        assert updated.asks == ((Decimal('100.03'), Decimal('3.0'), 1),)
+
+    def test_snapshot_waits_for_update_in_progress(self, book):
+        book._version += 1
+        reader = threading.Thread(target=book.get_snapshot)
+        reader.start()
+        reader.join(0.05)
+        assert reader.is_alive()
+        book._version += 1
+        reader.join(5)
+        assert not reader.is_alive()
+
+    def test_get_current_book_during_busy_feed(self):
+        feed = SyntheticFeed(levels=200, orders_per_level=20, seed=3)
+        order_book = gdax.OrderBook(product_id='BTC-USD')
+        order_book.load_snapshot(feed.snapshot())
+        stop = threading.Event()
+
+        def apply_feed():
+            for msg in feed.messages(10 ** 7):
+                if stop.is_set():
+                    return
+                order_book.on_message(msg)
+
+        feeder = threading.Thread(target=apply_feed)
+        feeder.start()
+        try:
+            reader = threading.Thread(target=lambda: [order_book.get_current_book() for _ in range(5)])
+            reader.start()
+            # a copy of the whole book takes longer than a message, so only a paused feed lets it complete
+            reader.join(10)
+            assert not reader.is_alive()
+            assert feeder.is_alive()
+        finally:
+            stop.set()
+            feeder.join()
+        assert order_book._reader_waiting is False
+        assert order_book.get_current_book()['sequence'] == order_book._sequence
+
+    def test_readers_during_busy_feed(self):
+        feed = SyntheticFeed(levels=50, orders_per_level=5, volatility=1.0, seed=5)
+        order_book = gdax.OrderBook(product_id='BTC-USD')
+        order_book.load_snapshot(feed.snapshot())
+        stop = threading.Event()
+
+        def apply_feed():
+            for msg in feed.messages(10 ** 7):
+                if stop.is_set():
+                    return
+                order_book.on_message(msg)
+
+        feeder = threading.Thread(target=apply_feed)
+        # switch threads as often as possible so reads overlap updates
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        feeder.start()
+        try:
+            for _ in range(2000):
+                depth = order_book.get_depth('buy', 50)
+                # a torn read would raise, or show levels out of order
+                assert [level[0] for level in depth] == sorted((level[0] for level in depth), reverse=True)
+                order_book.get_level(depth[0][0])
+                order_book.get_bids(depth[0][0])
+                order_book.get_bid()
+        finally:
+            sys.setswitchinterval(switch_interval)
+            stop.set()
+            feeder.join()
+
+    def test_top_of_book_listener(self, book):
+        tops = queue.Queue()
+        listener = book.add_top_of_book_listener(tops.put)
+        assert tops.get(timeout=5) == (100, Decimal('100.01'), Decimal('2.0'), Decimal('100.02'), Decimal('1.0'))
+
+        # below the best bid, nothing to report
+        book.on_message(message(101, type='open', side='buy', order_id='b4', price='99.00', remaining_size='1.0'))
+        book.on_message(message(102, type='open', side='sell', order_id='a3', price='100.02', remaining_size='0.5'))
+        assert tops.get(timeout=5) == (102, Decimal('100.01'), Decimal('2.0'), Decimal('100.02'), Decimal('1.5'))
+        assert tops.empty()
+
+        book.remove_top_of_book_listener(listener)
+        listener.join(5)
+        assert not listener.is_alive()
+
+        # the best ask leaves while nobody listens, and a new listener starts from the current book
+        book.on_message(message(103, type='done', side='sell', order_id='a1', price='100.02', remaining_size='1.0',
+                                reason='canceled'))
+        book.on_message(message(104, type='done', side='sell', order_id='a3', price='100.02', remaining_size='0.5',
+                                reason='canceled'))
+        listener = book.add_top_of_book_listener(tops.put)
+        assert tops.get(timeout=5) == (104, Decimal('100.01'), Decimal('2.0'), Decimal('100.03'), Decimal('3.0'))
+        book.remove_top_of_book_listener(listener)
+
+    def test_top_of_book_coalescing(self, book):
+        tops = queue.Queue()
+        book.add_top_of_book_listener(tops.put, coalesce_ms=200)
+        tops.get(timeout=5)
+        for i in range(10):
+            book.on_message(message(101 + i, type='open', side='sell', order_id='a{}'.format(i + 3),
+                                    price='100.02', remaining_size='1.0'))
+        assert tops.get(timeout=5) == (110, Decimal('100.01'), Decimal('2.0'), Decimal('100.02'), Decimal('11.0'))
+        assert tops.empty()
+
+    def test_get_depth_arrays(self, book):
+        np = pytest.importorskip('numpy')
+        depth = book.get_depth_arrays(5)
+        assert depth.sequence == 100
+        assert np.allclose(depth.bid_prices, [100.01, 100.00])
+        assert np.allclose(depth.bid_sizes, [2.0, 2.0])
+        assert np.allclose(depth.bid_counts, [2, 1])
+        assert np.allclose(depth.ask_prices, [100.02, 100.03])
+        assert np.allclose(depth.ask_sizes, [1.0, 3.0])
+        assert depth.bid_prices.flags['C_CONTIGUOUS']
+
+        book.on_message(message(101, type='done', side='sell', order_id='a1',
+                                price='100.02', remaining_size='1.0', reason='canceled'))
+        updated = book.get_depth_arrays(5)
+        assert np.allclose(updated.ask_prices, [100.03])
+        assert np.shares_memory(updated.ask_prices, depth.ask_prices)
+
+    @pytest.mark.parametrize('fixed_point,compact_ids', [(False, False), (True, False), (True, True)])
+    def test_synthetic_stream_matches_model(self, fixed_point, compact_ids):
+        feed = SyntheticFeed(levels=20, orders_per_level=5, volatility=1.0, seed=7)
+        order_book = gdax.OrderBook(product_id='BTC-USD', fixed_point=fixed_point, quote_increment='0.01',
+                                    compact_ids=compact_ids)
+        order_book.load_snapshot(feed.snapshot())
+        for msg in feed.messages(20000):
+            order_book.on_message(msg)
+
+        expected = gdax.OrderBook(product_id='BTC-USD')
+        expected.load_snapshot(feed.snapshot())
+        assert order_book._sequence == feed.sequence - 1
+        assert order_book.get_current_book() == expected.get_current_book()
+        assert order_book.get_depth('buy') == expected.get_depth('buy')
+        assert order_book.get_depth('sell') == expected.get_depth('sell')
+
+    def test_streamed_snapshot(self, tmpdir):
+        order_book = gdax.OrderBook(product_id='BTC-USD', log_to=str(tmpdir), compact_ids=True)
+        order_book._client = StreamingSnapshotClient(SNAPSHOT)
+        order_book.reset_book()
+        assert order_book.get_current_book() == {
+            'sequence': 100,
+            'bids': [[Decimal('100.00'), Decimal('2.0'), 'b3'], [Decimal('100.01'), Decimal('1.5'), 'b1'],
+                     [Decimal('100.01'), Decimal('0.5'), 'b2']],
+            'asks': [[Decimal('100.02'), Decimal('1.0'), 'a1'], [Decimal('100.03'), Decimal('3.0'), 'a2']],
+        }
+        assert order_book.get_level(Decimal('100.01')) == [Decimal('2.0'), 2]
+        assert JournalReader(str(tmpdir)).load_snapshot('BTC-USD', 100) == SNAPSHOT
+        order_book.journal.close()
+
+    def test_close_closes_journal_opened_from_path(self, tmpdir):
+        order_book = gdax.OrderBook(product_id='BTC-USD', log_to=str(tmpdir))
+        order_book.thread = threading.Thread(target=lambda: None)
+        order_book.thread.start()
+        order_book.close()
+        assert not order_book.journal._thread.is_alive()
+
+    def test_log_to_rejects_files(self, tmpdir):
+        with open(str(tmpdir.join('book.log')), 'wb') as log_file:
+            with pytest.raises(TypeError):
+                gdax.OrderBook(product_id='BTC-USD', log_to=log_file)
+            with pytest.raises(TypeError):
+                gdax.MultiOrderBook(product_ids=['BTC-USD'], log_to=log_file)
+
+    def test_compact_ids(self):
+        order_id = '6a7a7d4d-8d8b-4b5c-9b9e-4f0c6d2b1a3e'
+        order_book = gdax.OrderBook(product_id='BTC-USD', compact_ids=True)
+        order_book.load_snapshot({'sequence': 1, 'bids': [['100.00', '1.0', order_id], ['100.00', '2.0', 'b2']],
+                                  'asks': []})
+        assert isinstance(order_book._bids.peekitem(-1)[1].head.id, bytes)
+        assert [o['id'] for o in order_book.get_bids(Decimal('100.00'))] == [order_id, 'b2']
+        assert order_book.get_current_book()['bids'][0][2] == order_id
+
+        order_book.on_message(message(2, type='done', side='buy', order_id=order_id,
+                                      price='100.00', remaining_size='1.0', reason='canceled'))
+        assert order_book.get_level(Decimal('100.00')) == [Decimal('2.0'), 1]
+
+    def test_fixed_point_increments_from_products(self):
+        order_book = gdax.OrderBook(product_id='BTC-USD', fixed_point=True)
+        order_book._client = SnapshotClient(SNAPSHOT)
+        order_book.reset_book()
+        assert order_book._bids.peekitem(-1)[0] == 10001
+        assert order_book._orders['b1'].size == 150000000
+        # integer keys on Python 2 too, where round returns a float that cannot scale a Decimal
+        assert isinstance(order_book._bids.peekitem(-1)[0], int)
+        assert isinstance(order_book._orders['b1'].size, int)
+        assert order_book.get_bid() == Decimal('100.01')
+
+
+class MultiSnapshotClient(object):
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+
+    def get_product_order_book(self, product_id, level=1):
+        return self.snapshots[product_id]
+
+
+class FailingSnapshotClient(object):
+    def get_product_order_book(self, product_id, level=1):
+        raise IOError('unreachable')
+
+
+class TestMultiOrderBook(object):
+
+    def test_close_stops_snapshot_retries(self):
+        books = gdax.MultiOrderBook(product_ids=['BTC-USD'])
+        book = books.get_book('BTC-USD')
+        book._client = FailingSnapshotClient()
+        books.on_message(message(1, type='received', side='buy', order_id='b1'))
+        assert book._resyncing
+        books.on_close()
+        book._resync_thread.join(5)
+        assert not book._resync_thread.is_alive()
+        assert not book._resyncing
+
+    def test_routes_messages_by_product(self):
+        books = gdax.MultiOrderBook(product_ids=['BTC-USD', 'ETH-USD'])
+        eth_snapshot = {'sequence': 7, 'bids': [['300.00', '4.0', 'e1']], 'asks': [['300.10', '1.0', 'e2']]}
+        client = MultiSnapshotClient({'BTC-USD': SNAPSHOT, 'ETH-USD': eth_snapshot})
+        for book in books.books.values():
+            book._client = client
+            book.reset_book()
+
+        books.on_message({'type': 'subscriptions', 'channels': []})
+        books.on_message(message(8, product_id='ETH-USD', type='open', side='buy', order_id='e3',
+                                 price='300.00', remaining_size='1.0'))
+        books.on_message(message(101, type='done', side='sell', order_id='a1',
+                                 price='100.02', remaining_size='1.0', reason='canceled'))
+
+        assert books.get_book('ETH-USD').get_level(Decimal('300.00')) == [Decimal('5.0'), 2]
+        assert books.get_book('ETH-USD')._sequence == 8
+        assert books.get_book('BTC-USD').get_ask() == Decimal('100.03')
+        assert books.get_book('BTC-USD')._sequence == 101
@@ -0,0 +1,50 @@
+import json
+import pytest
+from gdax.order_book_stream import iter_order_book
+
+
+DOCUMENT = {
+    'sequence': 3456789012,
+    'bids': [['100.01', '1.5', 'b1'], ['100.00', '2.0', u'bé2']],
+    'asks': [],
+    'auction': None,
+}
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def collect(items):
+    result = {'bids': [], 'asks': []}
+    for key, value in items:
+        if key in ('bids', 'asks'):
+            result[key].extend(value)
+        else:
+            result[key] = value
+    return result
+
+
+class TestIterOrderBook(object):
+
+    @pytest.mark.parametrize('chunk_size', [1, 3, 7, 1 << 16])
+    def test_any_chunking(self, chunk_size):
+        body = json.dumps(DOCUMENT, indent=1, ensure_ascii=False).encode('utf-8')
+        assert collect(iter_order_book(chunked(body, chunk_size))) == DOCUMENT
+
+    def test_rows_are_yielded_before_the_end(self):
+        body = json.dumps({'sequence': 1, 'bids': [['1', '1', 'b1'], ['1', '1', 'b2']], 'asks': []}).encode('utf-8')
+        items = iter_order_book(chunked(body, 8))
+        assert next(items) == ('sequence', 1)
+        assert next(items) == ('bids', [['1', '1', 'b1']])
+
+    def test_truncated_body(self):
+        body = json.dumps(DOCUMENT).encode('utf-8')[:-10]
+        with pytest.raises(ValueError):
+            list(iter_order_book(chunked(body, 16)))
+
+    def test_brackets_in_strings(self):
+        document = {'sequence': 1, 'bids': [['1', '1', 'a]b'], ['1', '1', '[c'], ['2', '2', 'd']], 'asks': []}
+        body = json.dumps(document).encode('utf-8')
+        for chunk_size in (5, 1 << 16):
+            assert collect(iter_order_book(chunked(body, chunk_size))) == document
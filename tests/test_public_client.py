@@ -2,7 +2,16 @@ import pytest
 import gdax
 import time
 import datetime
+import threading
 from dateutil.relativedelta import relativedelta
+from gdax.public_client import make_session, shared_session
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
 
 
 @pytest.fixture(scope='module')
@@ -71,3 +80,57 @@ class TestPublicClient(object):
         r = client.get_time()
         assert type(r) is dict
         assert 'iso' in r
+
+
+class TimeHandler(BaseHTTPRequestHandler):
+    ''' Answers every request with the time, over HTTP/1.1 so the connection is kept alive, noting the client port. '''
+    protocol_version = 'HTTP/1.1'
+    ports = set()
+
+    def do_GET(self):
+        self.ports.add(self.client_address[1])
+        body = b'{"iso": "2017-11-07T08:19:27.028Z", "epoch": 1510042767.028}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer(ThreadingMixIn, HTTPServer):
+    # kept-alive connections would otherwise hold up shutdown
+    daemon_threads = True
+
+
+@pytest.fixture
+def local_url():
+    server = LocalServer(('127.0.0.1', 0), TimeHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    TimeHandler.ports.clear()
+    yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+class TestSession(object):
+
+    def test_clients_share_keep_alive_connections(self, local_url):
+        clients = [gdax.PublicClient(api_url=local_url), gdax.AuthenticatedClient('key', 'c2VjcmV0', 'passphrase',
+                                                                                   api_url=local_url)]
+        for _ in range(5):
+            for c in clients:
+                assert c.get_time()['iso'] == '2017-11-07T08:19:27.028Z'
+        assert len(TimeHandler.ports) == 1
+
+    def test_own_session(self, local_url):
+        session = make_session(pool_size=2, retries=0)
+        c = gdax.PublicClient(api_url=local_url, session=session)
+        c.get_time()
+        assert session.get_adapter(local_url)._pool_maxsize == 2
+        assert shared_session() is not session
+        assert shared_session() is shared_session()
@@ -0,0 +1,132 @@
+import threading
+import time
+from email.utils import formatdate
+import pytest
+import gdax
+from gdax.rate_limiter import RateLimiter, TokenBucket, retry_after, shared_rate_limiter
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def json(self):
+        return {'status': self.status_code}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession(object):
+    ''' Stands in for a requests Session, answering with `responses` in turn. '''
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append((method, url, kwargs))
+        return self.responses.pop(0)
+
+
+class FakeClock(object):
+    ''' Time that only moves when a caller sleeps, unless `frozen`. '''
+
+    def __init__(self, frozen=False):
+        self.now = 1000.0
+        self.frozen = frozen
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        if not self.frozen:
+            self.now += seconds
+
+
+class TestTokenBucket(object):
+
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=50, burst=2, clock=clock.time, sleep=clock.sleep)
+        waits = [bucket.acquire() for _ in range(4)]
+        assert waits[:2] == [0, 0]
+        assert waits[2] == pytest.approx(0.02)
+        # the previous caller's wait refilled the bucket by as much as it had taken
+        assert waits[3] == pytest.approx(0.02)
+        assert clock.now == pytest.approx(1000.04)
+        metrics = bucket.metrics()
+        assert metrics['requests'] == 4 and metrics['wait']['count'] == 4
+
+    def test_concurrent_callers_queue(self):
+        # time stands still, so every caller still finds the tokens reserved by those before it
+        clock = FakeClock(frozen=True)
+        bucket = TokenBucket(rate=100, burst=1, clock=clock.time, sleep=clock.sleep)
+        waits = []
+        threads = [threading.Thread(target=lambda: waits.append(bucket.acquire())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # each caller reserves its own token, 10ms after the previous one
+        assert sorted(waits) == [pytest.approx(0.01 * i) for i in range(5)]
+        assert sorted(clock.slept) == sorted(waits)[1:]
+
+    def test_pause_empties_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=100, burst=10, clock=clock.time, sleep=clock.sleep)
+        bucket.pause(0.05)
+        assert bucket.acquire() == pytest.approx(0.06)
+        assert bucket.throttled == 1
+
+    def test_waits_in_real_time(self):
+        bucket = TokenBucket(rate=100, burst=1)
+        started = time.time()
+        for _ in range(3):
+            bucket.acquire()
+        assert time.time() - started >= 0.02
+
+
+class TestRetryAfter(object):
+
+    def test_seconds_and_dates(self):
+        assert retry_after('2') == 2.0
+        assert retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=1.5)
+        assert retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+
+    def test_backoff_without_header(self):
+        assert [retry_after(None, attempt) for attempt in range(3)] == [1.0, 2.0, 4.0]
+        assert retry_after('soon', 1) == 2.0
+
+
+class TestClientRateLimiting(object):
+
+    def test_retries_throttled_requests(self):
+        throttled = FakeResponse(429, {'Retry-After': '0.01'})
+        session = FakeSession([throttled, FakeResponse(200)])
+        limiter = RateLimiter()
+        client = gdax.AuthenticatedClient('key', 'c2VjcmV0', 'passphrase', session=session, rate_limiter=limiter)
+        assert client.get_order('1') == {'status': 200}
+        assert throttled.closed and len(session.sent) == 2
+        assert limiter.private.metrics()['throttled'] == 1 and limiter.private.requests == 2
+        assert limiter.public.requests == 0
+
+    def test_gives_up_after_max_retries(self):
+        session = FakeSession([FakeResponse(429, {'Retry-After': '0'}) for _ in range(3)])
+        limiter = RateLimiter()
+        client = gdax.PublicClient(session=session, rate_limiter=limiter)
+        client.max_throttled_retries = 2
+        assert client.get_time() == {'status': 429}
+        assert limiter.public.throttled == 2 and limiter.public.requests == 3
+
+    def test_clients_share_a_limiter(self):
+        shared = shared_rate_limiter()
+        sent = shared.public.requests
+        for _ in range(2):
+            gdax.PublicClient(session=FakeSession([FakeResponse(200)])).get_time()
+        assert shared_rate_limiter() is shared
+        assert shared.public.requests == sent + 2
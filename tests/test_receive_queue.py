@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+import pytest
+from websocket import ABNF
+import gdax
+from gdax.receive_queue import ReceiveQueue, frame_product
+
+
+def frame(product_id, sequence):
+    return json.dumps({'type': 'ticker', 'product_id': product_id, 'sequence': sequence})
+
+
+def drain(q):
+    frames = []
+    q.close()
+    while True:
+        data, _ = q.get()
+        if data is None:
+            return frames
+        frames.append(json.loads(data)['sequence'])
+
+
+class FakeSocket(object):
+    ''' Serves `frames` to WebsocketClient._listen, stopping the client after the last one. '''
+
+    def __init__(self, client, frames):
+        self.client = client
+        self.frames = list(frames)
+
+    def ping(self, payload):
+        pass
+
+    def recv_data(self, control_frame=False):
+        data = self.frames.pop(0)
+        if not self.frames:
+            self.client.stop = True
+        return ABNF.OPCODE_TEXT, data.encode('utf-8')
+
+
+class RecordingClient(gdax.WebsocketClient):
+    def __init__(self, **kwargs):
+        super(RecordingClient, self).__init__(should_print=False, **kwargs)
+        self.received = {}
+        self.threads = set()
+
+    def on_message(self, msg):
+        self.received.setdefault(msg['product_id'], []).append(msg['sequence'])
+        self.threads.add(threading.current_thread().name)
+
+
+class TestReceiveQueue(object):
+
+    def test_frame_product(self):
+        assert frame_product(frame('ETH-USD', 1)) == 'ETH-USD'
+        assert frame_product(frame('ETH-USD', 1).encode('utf-8')) == 'ETH-USD'
+        assert frame_product('{"type": "subscriptions"}') is None
+
+    def test_drop_oldest(self):
+        q = ReceiveQueue(maxsize=2, overflow='drop_oldest')
+        for sequence in range(5):
+            q.put(frame('BTC-USD', sequence), None)
+        assert q.dropped == 3
+        assert drain(q) == [3, 4]
+
+    def test_coalesce_by_product(self):
+        q = ReceiveQueue(maxsize=2, overflow='coalesce')
+        q.put(frame('BTC-USD', 1), None, 'BTC-USD')
+        q.put(frame('ETH-USD', 2), None, 'ETH-USD')
+        q.put(frame('BTC-USD', 3), None, 'BTC-USD')
+        q.put(frame('LTC-USD', 4), None, 'LTC-USD')
+        assert (q.coalesced, q.dropped, q.max_depth) == (1, 1, 2)
+        assert drain(q) == [2, 4]
+
+    def test_block_waits_for_room(self):
+        q = ReceiveQueue(maxsize=1)
+        q.put(frame('BTC-USD', 1), time.time())
+        producer = threading.Thread(target=q.put, args=(frame('BTC-USD', 2), time.time()))
+        producer.start()
+        producer.join(0.05)
+        assert producer.is_alive()
+        assert json.loads(q.get()[0])['sequence'] == 1
+        producer.join(5)
+        assert drain(q) == [2]
+        assert q.lag.count == 2
+
+    def test_invalid_policy(self):
+        with pytest.raises(ValueError):
+            ReceiveQueue(overflow='spill')
+
+
+class TestWebsocketClientWorkers(object):
+
+    def test_workers_keep_product_order(self):
+        client = RecordingClient(workers=3, queue_size=4)
+        frames = [frame(product_id, sequence) for sequence in range(50) for product_id in ('BTC-USD', 'ETH-USD')]
+        client.ws = FakeSocket(client, frames)
+        client._start_workers()
+        client._listen()
+        client._stop_workers()
+        assert client.received == {'BTC-USD': list(range(50)), 'ETH-USD': list(range(50))}
+        assert threading.current_thread().name not in client.threads
+        assert sum(metrics['lag']['count'] for metrics in client.queue_metrics()) == 100
@@ -0,0 +1,75 @@
+import json
+import gdax
+from decimal import Decimal
+from gdax.replay import Replay
+
+
+SNAPSHOT = {
+    'sequence': 100,
+    'bids': [['100.01', '1.5', 'b1'], ['100.00', '2.0', 'b2']],
+    'asks': [['100.02', '1.0', 'a1']],
+}
+
+
+def record(journal, sequence, **fields):
+    fields.update(sequence=sequence, product_id='BTC-USD')
+    journal.write(json.dumps(fields), 1000.0 + sequence)
+
+
+class TestReplay(object):
+
+    def test_replay_into_order_book(self, tmpdir):
+        journal = gdax.JournalWriter(str(tmpdir))
+        record(journal, 99, type='received', side='buy', order_id='b1')
+        journal.write_snapshot('BTC-USD', SNAPSHOT)
+        record(journal, 100, type='open', side='buy', order_id='b1', price='100.01', remaining_size='1.5')
+        record(journal, 101, type='open', side='sell', order_id='a2', price='100.03', remaining_size='2.0')
+        record(journal, 102, type='match', side='buy', maker_order_id='b1', taker_order_id='t1',
+               price='100.01', size='0.5')
+        journal.close()
+
+        book = gdax.OrderBook(product_id='BTC-USD')
+        stats = Replay(book, str(tmpdir)).run()
+        assert stats.messages == 3
+        assert stats.messages_per_second > 0
+        assert stats.latency.percentile(99) is not None
+        assert book._sequence == 102
+        assert book.get_level(Decimal('100.01')) == [Decimal('1.0'), 1]
+        assert book.get_depth('sell') == [[Decimal('100.02'), Decimal('1.0'), 1], [Decimal('100.03'), Decimal('2.0'), 1]]
+
+    def test_gap_resyncs_from_journal(self, tmpdir):
+        journal = gdax.JournalWriter(str(tmpdir))
+        journal.write_snapshot('BTC-USD', SNAPSHOT)
+        record(journal, 101, type='done', side='sell', order_id='a1', price='100.02', remaining_size='1.0')
+        # the live book missed 102-104 and resynced from a fresh snapshot
+        journal.write_snapshot('BTC-USD', dict(SNAPSHOT, sequence=105, asks=[['100.05', '1.0', 'a3']]))
+        record(journal, 105, type='open', side='sell', order_id='a3', price='100.05', remaining_size='1.0')
+        record(journal, 106, type='open', side='sell', order_id='a4', price='100.04', remaining_size='1.0')
+        journal.close()
+
+        book = gdax.OrderBook(product_id='BTC-USD')
+        Replay(book, str(tmpdir)).run()
+        assert book._sequence == 106
+        assert [level[0] for level in book.get_depth('sell')] == [Decimal('100.04'), Decimal('100.05')]
+
+    def test_replay_into_level2_books(self, tmpdir):
+        journal = gdax.JournalWriter(str(tmpdir))
+        frames = [
+            {'type': 'snapshot', 'product_id': 'BTC-USD', 'bids': [['100.01', '1.5']], 'asks': [['100.02', '1.0']]},
+            {'type': 'l2update', 'product_id': 'BTC-USD',
+             'changes': [['sell', '100.02', '0'], ['buy', '100.00', '2.0']]},
+            {'type': 'match', 'product_id': 'BTC-USD', 'sequence': 7, 'side': 'sell', 'price': '100.02', 'size': '1.0'},
+            {'type': 'l2update', 'product_id': 'BTC-USD', 'changes': [['sell', '100.03', '3.0']]},
+        ]
+        for i, frame in enumerate(frames):
+            journal.write(json.dumps(frame), 1000.0 + i)
+        journal.close()
+
+        books = gdax.MultiOrderBook(product_ids=['BTC-USD'], level=2)
+        stats = Replay(books, str(tmpdir)).run()
+        book = books.get_book('BTC-USD')
+        assert stats.messages == 4
+        assert book.get_depth('buy') == [[Decimal('100.01'), Decimal('1.5'), None],
+                                         [Decimal('100.00'), Decimal('2.0'), None]]
+        assert book.get_ask() == Decimal('100.03')
+        assert book.get_current_ticker()['price'] == '100.02'
@@ -0,0 +1,51 @@
+import math
+import multiprocessing
+import gdax
+from gdax.book_features import BookFeatures
+from gdax.sharded import ShardedOrderBook, _SlotWriter
+from gdax.top_of_book import TopOfBook
+from tests.test_order_book import SNAPSHOT, message
+
+
+def publish_from_child(slots, index):
+    ''' Runs in a worker process: builds a book and publishes its top of book before and after a message. '''
+    book = gdax.OrderBook(product_id='ETH-USD', fixed_point=True, quote_increment='0.01', base_increment='0.1',
+                          features=BookFeatures())
+    book.load_snapshot(SNAPSHOT)
+    writer = _SlotWriter(slots, index, book)
+    writer(TopOfBook(*book._read_top()))
+    book.on_message(message(101, type='done', side='sell', order_id='a1', price='100.02', remaining_size='1.0',
+                            reason='canceled', product_id='ETH-USD'))
+    writer(TopOfBook(*book._read_top()))
+
+
+class TestShardedOrderBook(object):
+
+    def test_deals_products_to_processes(self):
+        books = ShardedOrderBook(['BTC-USD', 'ETH-USD', 'LTC-USD'], processes=2)
+        assert books.shards == [['BTC-USD', 'LTC-USD'], ['ETH-USD']]
+        assert ShardedOrderBook(['BTC-USD'], processes=8).shards == [['BTC-USD']]
+        assert books.get_top('ETH-USD') is None and books.version('ETH-USD') == 0
+
+    def test_top_of_book_crosses_processes(self):
+        books = ShardedOrderBook(['BTC-USD', 'ETH-USD'], processes=2)
+        child = multiprocessing.Process(target=publish_from_child, args=(books._slots, books._slot['ETH-USD']))
+        child.start()
+        child.join(10)
+        assert child.exitcode == 0
+        top = books.get_top('ETH-USD')
+        assert books.version('ETH-USD') == 2
+        assert top.sequence == 101
+        assert (top.bid, top.bid_size, top.ask, top.ask_size) == (100.01, 2.0, 100.03, 3.0)
+        assert top.imbalance is not None and not math.isnan(top.imbalance)
+        assert books.get_bid('ETH-USD') == 100.01 and books.get_ask('ETH-USD') == 100.03
+        assert books.get_top('BTC-USD') is None
+
+    def test_empty_side_and_no_features(self):
+        books = ShardedOrderBook(['BTC-USD'])
+        book = gdax.OrderBook(product_id='BTC-USD')
+        book.load_snapshot(dict(SNAPSHOT, asks=[]))
+        _SlotWriter(books._slots, 0, book)(TopOfBook(*book._read_top()))
+        top = books.get_top('BTC-USD')
+        assert top.bid == 100.01 and books.get_ask('BTC-USD') is None
+        assert math.isnan(top.ask) and math.isnan(top.microprice)
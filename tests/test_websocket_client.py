@@ -0,0 +1,213 @@
+import calendar
+import json
+import threading
+import time
+from datetime import datetime
+from websocket import ABNF, WebSocketConnectionClosedException
+import pytest
+import gdax
+import gdax.websocket_client
+from gdax.receive_queue import frame_type
+from gdax.websocket_client import exchange_time
+from tests.test_order_book import SNAPSHOT, SnapshotClient, message
+
+
+class FakeConnection(object):
+    ''' Serves `frames` like a websocket-client connection, then fails with `error` or stops `client`. '''
+
+    def __init__(self, client, frames, error=None):
+        self.client = client
+        self.frames = list(frames)
+        self.error = error
+        self.sent = []
+        self.pings = []
+        self.closed = False
+        self.aborted = False
+
+    def send(self, data):
+        self.sent.append(json.loads(data))
+
+    def ping(self, payload):
+        self.pings.append(payload)
+
+    def recv_data(self, control_frame=False):
+        if not self.frames:
+            raise self.error
+        data = self.frames.pop(0)
+        if not self.frames and self.error is None:
+            self.client.stop = True
+        if isinstance(data, tuple):
+            return data
+        return ABNF.OPCODE_TEXT, data.encode('utf-8')
+
+    def close(self):
+        self.closed = True
+
+    def abort(self):
+        self.aborted = True
+
+
+class RecordingClient(gdax.WebsocketClient):
+    def __init__(self, **kwargs):
+        super(RecordingClient, self).__init__(should_print=False, reconnect=True, backoff=0.001, **kwargs)
+        self.events = []
+
+    def on_message(self, msg):
+        self.events.append(msg['sequence'])
+
+    def on_reconnect(self):
+        self.events.append('reconnect')
+
+    def on_close(self):
+        self.events.append('close')
+
+
+def connect_to(monkeypatch, connections):
+    ''' Makes create_connection return each of `connections` in turn, raising the exceptions among them. '''
+    connections = list(connections)
+
+    def create_connection(url):
+        connection = connections.pop(0)
+        if isinstance(connection, Exception):
+            raise connection
+        return connection
+
+    monkeypatch.setattr(gdax.websocket_client, 'create_connection', create_connection)
+
+
+class TestSupervisedWebsocketClient(object):
+
+    def test_reconnects_and_resubscribes(self, monkeypatch):
+        client = RecordingClient(products=['BTC-USD'], channels=['full'], auth=True, api_key='key',
+                                 api_secret='c2VjcmV0', api_passphrase='passphrase')
+        first = FakeConnection(client, ['{"sequence": 1}', 'not json', '{"sequence": 2}'],
+                               WebSocketConnectionClosedException('dropped'))
+        second = FakeConnection(client, ['{"sequence": 3}'])
+        connect_to(monkeypatch, [first, IOError('refused'), second])
+        client.start()
+        client.thread.join(5)
+        assert client.events == [1, 2, 'reconnect', 3, 'close']
+        assert client.reconnects == 1
+        assert isinstance(client.error, ValueError)
+        assert first.closed and second.closed
+        assert [sent['product_ids'] for sent in first.sent + second.sent] == [['BTC-USD'], ['BTC-USD']]
+        assert first.sent[0]['signature'] and second.sent[0]['timestamp'] >= first.sent[0]['timestamp']
+
+    def test_survives_failing_handler(self, monkeypatch):
+        client = RecordingClient()
+
+        def on_message(msg):
+            client.events.append(msg['sequence'])
+            if msg['sequence'] == 1:
+                raise AssertionError('book diverged')
+
+        client.on_message = on_message
+        connection = FakeConnection(client, ['{"sequence": 1}', '{"sequence": 2}'])
+        connect_to(monkeypatch, [connection])
+        client.start()
+        client.thread.join(5)
+        assert client.events == [1, 2, 'close']
+        assert isinstance(client.error, AssertionError)
+        assert connection.closed
+
+    def test_close_interrupts_backoff(self, monkeypatch):
+        client = RecordingClient()
+        client.backoff = 60
+        connect_to(monkeypatch, [IOError('refused')])
+        client.start()
+        client.close()
+        assert not client.thread.is_alive()
+        assert client.events == ['close']
+
+    def test_order_book_resyncs_after_reconnect(self):
+        book = gdax.OrderBook(product_id='BTC-USD', reconnect=True)
+        book.load_snapshot(SNAPSHOT)
+        # the exchange moved on while the client was disconnected
+        book._client = SnapshotClient(dict(SNAPSHOT, sequence=149))
+        book.on_reconnect()
+        book.on_message(message(150, type='received', side='buy', order_id='b5'))
+        book._resync_thread.join(5)
+        assert book._sequence == 150
+
+    def test_multi_order_book_supervises_its_connection(self):
+        books = gdax.MultiOrderBook(product_ids=['BTC-USD', 'ETH-USD'], reconnect=True, backoff=0.5,
+                                    ping_interval=None, compact_ids=True)
+        assert books.reconnect and books.backoff == 0.5 and books.ping_interval is None
+        for book in books.books.values():
+            assert not book.reconnect and book._compact_ids
+        books.on_reconnect()
+        assert all(book._resync_requested for book in books.books.values())
+
+
+class TestHeartbeat(object):
+
+    def test_exchange_time(self):
+        second = calendar.timegm((2017, 11, 7, 8, 19, 27))
+        assert exchange_time('2017-11-07T08:19:27.028459Z') == pytest.approx(second + 0.028459)
+        assert exchange_time('2017-11-07T08:19:27.5Z') == pytest.approx(second + 0.5)
+        assert exchange_time('2017-11-07T08:19:28Z') == second + 1
+
+    def test_records_pongs_and_latency(self):
+        client = RecordingClient()
+        client.reconnect = False
+        now = time.time()
+        sent = datetime.utcfromtimestamp(now - 0.25).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        client.ws = FakeConnection(client, [
+            (ABNF.OPCODE_PONG, '{:.6f}'.format(now - 0.01).encode('ascii')),
+            json.dumps({'type': 'match', 'sequence': 1, 'time': sent}),
+            json.dumps({'type': 'heartbeat', 'sequence': 2}),
+        ])
+        client._ping_at = now
+        client._listen()
+        assert client.events == [1, 2]
+        # pings come from the heartbeat thread, not from every receive
+        assert client.ws.pings == []
+        metrics = client.latency_metrics()
+        assert metrics['ping_rtt']['count'] == 1 and metrics['ping_rtt']['min'] >= 0.01
+        assert client._ping_at is None
+        assert list(metrics['latency']) == ['match']
+        assert metrics['latency']['match']['min'] >= 0.25
+
+    def test_unanswered_ping_reconnects(self):
+        client = RecordingClient(ping_interval=0.01)
+        client.ws = FakeConnection(client, [])
+        heartbeat = threading.Thread(target=client._heartbeat)
+        heartbeat.start()
+        deadline = time.time() + 5
+        while not client.ws.aborted and time.time() < deadline:
+            time.sleep(0.01)
+        client._wakeup.set()
+        heartbeat.join()
+        assert client.ws.aborted
+        assert len(client.ws.pings) >= 1
+
+
+class TestDispatch(object):
+
+    def test_frame_type(self):
+        assert frame_type('{"type":"match","product_id":"BTC-USD"}') == 'match'
+        assert frame_type(b'{"type": "l2update"}') == 'l2update'
+        assert frame_type('{"sequence": 1}') is None
+
+    def test_handlers_and_skipped_types(self):
+        decoded = []
+
+        def decoder(data):
+            decoded.append(data)
+            return json.loads(data)
+
+        client = RecordingClient(message_types=['match', 'ticker'], decoder=decoder)
+        client.reconnect = False
+        matches = []
+        client.add_handler('match', matches.append)
+        frames = [json.dumps({'type': msg_type, 'sequence': sequence})
+                  for sequence, msg_type in enumerate(['received', 'open', 'match', 'done', 'ticker'])]
+        client.ws = FakeConnection(client, frames)
+        client._listen()
+        assert [msg['sequence'] for msg in matches] == [2]
+        assert client.events == [4]
+        assert len(decoded) == 2 and client.skipped == 3
+
+        client.remove_handler('match')
+        client._dispatch({'type': 'match', 'sequence': 5})
+        assert client.events == [4, 5]